@@ -0,0 +1,47 @@
+"""Measure the throughput of Monkey function calls.
+
+    $ PYTHONPATH=src python benchmarks/calls.py [n]
+
+Evaluates fib(n) and reports calls per second, together with how many call
+environments were allocated and how many were recycled from the pool.
+"""
+import sys
+import time
+
+from monkey import evaluator, lexer, object, parser
+
+FIB = '''
+let fib = fn(n) {
+  if (n < 2) { n } else { fib(n - 1) + fib(n - 2) }
+};
+fib(%d);
+'''
+
+
+def fib_calls(n: int) -> int:
+    a, b = 1, 1
+    for _ in range(n):
+        a, b = b, a + b + 1
+    return a
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    program = parser.Parser(lexer.Lexer(FIB % n)).parse_program()
+    frames = evaluator.frames
+    allocations, reuses = frames.allocations, frames.reuses
+
+    start = time.perf_counter()
+    result = evaluator.eval(program, object.Environment())
+    elapsed = time.perf_counter() - start
+
+    calls = fib_calls(n)
+    print('fib({}) = {}'.format(n, result.inspect()))
+    print('{} calls in {:.3f}s, {:.0f} calls/s'.format(calls, elapsed, calls / elapsed))
+    print('environments allocated: {}, recycled: {}'.format(
+        frames.allocations - allocations, frames.reuses - reuses))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Load test a running `pymonkey serve`.
+
+    $ pymonkey serve --port 8080 &
+    $ PYTHONPATH=src python benchmarks/load.py [--port 8080] [-c CLIENTS] [-n REQUESTS]
+                                               [--source SOURCE | --script ID]
+
+Sends REQUESTS evaluation requests from CLIENTS concurrent connections and
+reports the throughput, the latency percentiles and the statuses received.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import statistics
+import time
+from typing import List
+
+FIB = 'let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(10)'
+
+
+async def request(host: str, port: int, body: bytes) -> int:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(b'POST /eval HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def client(host: str, port: int, body: bytes, remaining: List[int],
+                 latencies: List[float], statuses: collections.Counter):
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        start = time.perf_counter()
+        try:
+            status = await request(host, port, body)
+        except OSError as e:
+            status = e.__class__.__name__
+        latencies.append(time.perf_counter() - start)
+        statuses[status] += 1
+
+
+async def main():
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument('--host', default='127.0.0.1')
+    args.add_argument('--port', type=int, default=8080)
+    args.add_argument('-c', '--clients', type=int, default=16)
+    args.add_argument('-n', '--requests', type=int, default=1000)
+    args.add_argument('--source', default=FIB, help='Monkey source to evaluate, fib(10) by default')
+    args.add_argument('--script', help='id of a script in the served directory, instead of --source')
+    args = args.parse_args()
+
+    body = json.dumps({'script': args.script} if args.script else {'source': args.source}).encode('utf-8')
+    latencies: List[float] = []
+    statuses: collections.Counter = collections.Counter()
+    remaining = [args.requests]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args.host, args.port, body, remaining, latencies, statuses)
+                           for _ in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print('{} requests in {:.3f}s, {:.0f} requests/s'.format(len(latencies), elapsed, len(latencies) / elapsed))
+    print('latency p50 {:.2f}ms, p90 {:.2f}ms, p99 {:.2f}ms, max {:.2f}ms'.format(
+        quantiles[49] * 1000, quantiles[89] * 1000, quantiles[98] * 1000, latencies[-1] * 1000))
+    print('statuses: ' + ', '.join('{}: {}'.format(s, n) for s, n in sorted(statuses.items(), key=str)))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
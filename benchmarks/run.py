@@ -0,0 +1,133 @@
+"""Time lexing, parsing and evaluating a set of representative programs.
+
+    $ PYTHONPATH=src python benchmarks/run.py [-n RUNS] [--save BASELINE]
+                                              [--compare BASELINE] [name ...]
+
+Every benchmark in benchmarks/programs is lexed, parsed and evaluated RUNS
+times, and the median and standard deviation of each phase are reported. The
+generated `parse` benchmark is only lexed and parsed. --save writes the
+medians to a JSON file, and --compare flags every phase whose median is more
+than --threshold slower than in a saved baseline, exiting with status 1.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from monkey import evaluator, lexer, object, parser
+
+PROGRAMS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'programs')
+PHASES = ['lex', 'parse', 'eval']
+
+
+def generated_program(functions: int = 2000) -> str:
+    """Return a large program of function definitions, for the parser."""
+    lines = []
+    for i in range(functions):
+        lines.append('let f%s = fn(a, b) { if (a < b) { [a, b, a * b] } else { {"a": a, "b": -b} } };'
+                     % ''.join(chr(ord('a') + int(d)) for d in str(i)))
+    return '\n'.join(lines)
+
+
+def load_benchmarks() -> Dict[str, str]:
+    benchmarks = {}
+    for path in sorted(glob.glob(os.path.join(PROGRAMS, '*.monkey'))):
+        with open(path) as f:
+            benchmarks[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    benchmarks['parse'] = generated_program()
+    return benchmarks
+
+
+def run_once(name: str, source: str) -> Dict[str, float]:
+    start = time.perf_counter()
+    tokens = lexer.tokenize(source)
+    lexed = time.perf_counter()
+    p = parser.Parser(lexer.TokenStream(tokens))
+    program = p.parse_program()
+    parsed = time.perf_counter()
+    if len(p.errors) != 0:
+        raise ValueError('{}: {}'.format(name, p.errors[0]))
+
+    times = {'lex': lexed - start, 'parse': parsed - lexed}
+    if name != 'parse':
+        result = evaluator.eval(program, object.Environment())
+        times['eval'] = time.perf_counter() - parsed
+        if result.__class__ is object.Error:
+            raise ValueError('{}: {}'.format(name, result.message))
+    return times
+
+
+def run(name: str, source: str, runs: int) -> Dict[str, Dict[str, float]]:
+    samples: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        for phase, seconds in run_once(name, source).items():
+            samples.setdefault(phase, []).append(seconds)
+
+    return {phase: {'median': statistics.median(times),
+                    'stddev': statistics.stdev(times) if len(times) > 1 else 0.0}
+            for phase, times in samples.items()}
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Return a line for every phase slower than in `baseline` by more than `threshold`."""
+    slowdowns = []
+    for name, phases in results.items():
+        for phase, stats in phases.items():
+            before = baseline.get(name, {}).get(phase)
+            if before is None or before['median'] == 0:
+                continue
+            change = stats['median'] / before['median'] - 1
+            if change > threshold:
+                slowdowns.append('{} {}: {:.6f}s -> {:.6f}s (+{:.0%})'.format(
+                    name, phase, before['median'], stats['median'], change))
+    return slowdowns
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument('names', nargs='*', help='benchmarks to run, all by default')
+    args.add_argument('-n', '--runs', type=int, default=5)
+    args.add_argument('--save', metavar='BASELINE', help='write the results to BASELINE')
+    args.add_argument('--compare', metavar='BASELINE', help='flag slowdowns against BASELINE')
+    args.add_argument('--threshold', type=float, default=0.10,
+                      help='relative slowdown that is flagged, 0.10 by default')
+    args = args.parse_args()
+
+    # Monkey recursion costs several Python frames per call
+    sys.setrecursionlimit(20000)
+
+    benchmarks = load_benchmarks()
+    names = args.names or list(benchmarks)
+    for name in names:
+        if name not in benchmarks:
+            sys.exit('unknown benchmark: {} (one of {})'.format(name, ', '.join(benchmarks)))
+
+    results = {}
+    print('{:<12} {:<6} {:>12} {:>12}'.format('benchmark', 'phase', 'median (s)', 'stddev (s)'))
+    for name in names:
+        results[name] = run(name, benchmarks[name], args.runs)
+        for phase in PHASES:
+            if phase in results[name]:
+                stats = results[name][phase]
+                print('{:<12} {:<6} {:>12.6f} {:>12.6f}'.format(name, phase, stats['median'], stats['stddev']))
+
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            slowdowns = compare(results, json.load(f), args.threshold)
+        for line in slowdowns:
+            print('slower: ' + line)
+        if slowdowns:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
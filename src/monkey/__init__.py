@@ -1,6 +1,9 @@
 from . import ast
 from . import evaluator
+from . import interpreter
 from . import lexer
 from . import object
 from . import parser
 from . import token
+
+from .interpreter import Interpreter
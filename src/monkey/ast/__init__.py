@@ -1 +1,4 @@
 from .ast import *
+from .serialize import *
+from .arena import *
+from .scope import *
@@ -0,0 +1,288 @@
+from array import array
+from typing import Dict, Iterator, List, Set, Union
+
+from monkey import token
+from . import ast
+
+# Node kinds, in the order of their kind codes. Kind 0 stands for a missing
+# child (e.g. an if without else), so that children keep their positions.
+KINDS: List[str] = [
+    'None',
+    'Program',
+    'Identifier',
+    'LetStatement',
+    'ReturnStatement',
+    'ExpressionStatement',
+    'BlockStatement',
+    'Boolean',
+    'IntegerLiteral',
+    'PrefixExpression',
+    'InfixExpression',
+    'IfExpression',
+    'FunctionLiteral',
+    'CallExpression',
+    'StringLiteral',
+    'ArrayLiteral',
+    'IndexExpression',
+    'HashLiteral',
+    'ErrorStatement',
+]
+
+KIND_CODES: Dict[str, int] = {name: code for code, name in enumerate(KINDS)}
+
+NO_NODE = -1
+
+
+class NodeArena:
+    """An AST stored as parallel typed arrays instead of one object per node.
+
+    Node i is described by kind[i], first_child[i] and next_sibling[i] (both
+    NO_NODE if absent), and the type and literal of its token, which are
+    indices into the shared string pool, plus the token's start offset.
+    Everything else, such as operators and literal values, is derived from
+    the token. The children of each kind are, in order:
+
+        Program, BlockStatement   statements
+        LetStatement              name, value
+        ReturnStatement           return value
+        ExpressionStatement       expression
+        PrefixExpression          right
+        InfixExpression           left, right
+        IfExpression              condition, consequence, alternative
+        FunctionLiteral           body, parameters...
+        CallExpression            function, arguments...
+        ArrayLiteral              elements...
+        IndexExpression           left, index
+        HashLiteral               key, value, key, value...
+        ErrorStatement            partial statement
+
+    The message of an ErrorStatement, the only node with a string not taken
+    from its token, is kept in the sparse `messages` map. A partial parse can
+    leave the list of children after the fixed ones as None rather than
+    empty, e.g. the arguments of an unterminated call; such nodes are kept in
+    the sparse `missing_lists` set so the round trip gives None back. Node 0
+    is the root.
+    """
+
+    def __init__(self):
+        self.kind = array('B')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.token_type = array('i')
+        self.literal = array('i')
+        self.start = array('i')
+
+        self.strings: List[str] = []
+        self.string_index: Dict[str, int] = {}
+
+        self.messages: Dict[int, int] = {}  # node index -> string index
+        self.missing_lists: Set[int] = set()  # node indices
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def intern(self, s: str) -> int:
+        index = self.string_index.get(s)
+        if index is None:
+            index = self.string_index[s] = len(self.strings)
+            self.strings.append(s)
+        return index
+
+    def add(self, kind: int, tok: Union[token.Token, None]) -> int:
+        index = len(self.kind)
+        self.kind.append(kind)
+        self.first_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+        if tok is None:
+            self.token_type.append(NO_NODE)
+            self.literal.append(NO_NODE)
+            self.start.append(0)
+        else:
+            self.token_type.append(self.intern(tok.type))
+            self.literal.append(self.intern(tok.literal))
+            self.start.append(tok.start)
+        return index
+
+    def cursor(self, index: int = 0) -> 'Cursor':
+        return Cursor(self, index)
+
+    @classmethod
+    def from_program(cls, program: ast.Program) -> 'NodeArena':
+        arena = cls()
+        _Builder(arena).node(program)
+        return arena
+
+    def to_program(self) -> ast.Program:
+        return self.cursor().to_node()
+
+
+class Cursor:
+    """A lightweight pointer to one node of a NodeArena."""
+
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena: NodeArena, index: int):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def kind(self) -> int:
+        return self.arena.kind[self.index]
+
+    @property
+    def kind_name(self) -> str:
+        return KINDS[self.arena.kind[self.index]]
+
+    @property
+    def token_type(self) -> Union[str, None]:
+        i = self.arena.token_type[self.index]
+        return self.arena.strings[i] if i != NO_NODE else None
+
+    @property
+    def literal(self) -> Union[str, None]:
+        i = self.arena.literal[self.index]
+        return self.arena.strings[i] if i != NO_NODE else None
+
+    @property
+    def start(self) -> int:
+        return self.arena.start[self.index]
+
+    @property
+    def message(self) -> Union[str, None]:
+        i = self.arena.messages.get(self.index)
+        return self.arena.strings[i] if i is not None else None
+
+    def is_none(self) -> bool:
+        return self.arena.kind[self.index] == 0
+
+    def first_child(self) -> Union['Cursor', None]:
+        i = self.arena.first_child[self.index]
+        return Cursor(self.arena, i) if i != NO_NODE else None
+
+    def next_sibling(self) -> Union['Cursor', None]:
+        i = self.arena.next_sibling[self.index]
+        return Cursor(self.arena, i) if i != NO_NODE else None
+
+    def children(self) -> Iterator['Cursor']:
+        arena = self.arena
+        i = arena.first_child[self.index]
+        while i != NO_NODE:
+            yield Cursor(arena, i)
+            i = arena.next_sibling[i]
+
+    def to_node(self) -> Union[ast.Node, None]:
+        """Rebuild the object AST of the subtree under this cursor."""
+        name = self.kind_name
+        if name == 'None':
+            return None
+
+        children = [c.to_node() for c in self.children()]
+        missing = self.index in self.arena.missing_lists
+        if name == 'Program':
+            return ast.Program(None if missing else children)
+
+        literal = self.literal
+        length = len(literal) + 2 if self.token_type == token.STRING else len(literal)
+        tok = token.Token(self.token_type, literal, self.start, self.start + length)
+
+        if name == 'Identifier':
+            return ast.Identifier(tok, literal)
+        elif name == 'LetStatement':
+            return ast.LetStatement(tok, children[0], children[1])
+        elif name == 'ReturnStatement':
+            return ast.ReturnStatement(tok, children[0])
+        elif name == 'ExpressionStatement':
+            return ast.ExpressionStatement(tok, children[0])
+        elif name == 'BlockStatement':
+            return ast.BlockStatement(tok, None if missing else children)
+        elif name == 'Boolean':
+            return ast.Boolean(tok, tok.type == token.TRUE)
+        elif name == 'IntegerLiteral':
+            return ast.IntegerLiteral(tok, int(literal))
+        elif name == 'PrefixExpression':
+            return ast.PrefixExpression(tok, literal, children[0])
+        elif name == 'InfixExpression':
+            return ast.InfixExpression(tok, children[0], literal, children[1])
+        elif name == 'IfExpression':
+            return ast.IfExpression(tok, children[0], children[1], children[2])
+        elif name == 'FunctionLiteral':
+            return ast.FunctionLiteral(tok, None if missing else children[1:], children[0])
+        elif name == 'CallExpression':
+            return ast.CallExpression(tok, children[0], None if missing else children[1:])
+        elif name == 'StringLiteral':
+            return ast.StringLiteral(tok, literal)
+        elif name == 'ArrayLiteral':
+            return ast.ArrayLiteral(tok, None if missing else children)
+        elif name == 'IndexExpression':
+            return ast.IndexExpression(tok, children[0], children[1])
+        elif name == 'ErrorStatement':
+            return ast.ErrorStatement(tok, self.message, children[0])
+        else:
+            pairs = None if missing else dict(zip(children[0::2], children[1::2]))
+            return ast.HashLiteral(tok, pairs)
+
+
+class _Builder:
+
+    def __init__(self, arena: NodeArena):
+        self.arena = arena
+
+    def node(self, node: Union[ast.Node, None]) -> int:
+        arena = self.arena
+        if node is None:
+            return arena.add(0, None)
+
+        name = node.__class__.__name__
+        if name == 'LazyBlockStatement':
+            name = 'BlockStatement'
+        if name not in KIND_CODES:
+            raise ValueError('cannot store node {} in an arena'.format(name))
+        index = arena.add(KIND_CODES[name], getattr(node, 'token', None))
+
+        items = []
+        if name == 'Program' or name == 'BlockStatement':
+            children = items = node.statements
+        elif name == 'LetStatement':
+            children = [node.name, node.value]
+        elif name == 'ReturnStatement':
+            children = [node.return_value]
+        elif name == 'ExpressionStatement':
+            children = [node.expression]
+        elif name == 'PrefixExpression':
+            children = [node.right]
+        elif name == 'InfixExpression':
+            children = [node.left, node.right]
+        elif name == 'IfExpression':
+            children = [node.condition, node.consequence, node.alternative]
+        elif name == 'FunctionLiteral':
+            items = node.parameters
+            children = [node.body] + (items or [])
+        elif name == 'CallExpression':
+            items = node.arguments
+            children = [node.function] + (items or [])
+        elif name == 'ArrayLiteral':
+            children = items = node.elements
+        elif name == 'IndexExpression':
+            children = [node.left, node.index]
+        elif name == 'HashLiteral':
+            items = node.pairs
+            children = [n for pair in (items or {}).items() for n in pair]
+        elif name == 'ErrorStatement':
+            children = [node.partial]
+            if node.message is not None:
+                arena.messages[index] = arena.intern(node.message)
+        else:
+            children = []
+        if items is None:
+            arena.missing_lists.add(index)
+
+        prev = NO_NODE
+        for child in children or []:
+            i = self.node(child)
+            if prev == NO_NODE:
+                arena.first_child[index] = i
+            else:
+                arena.next_sibling[prev] = i
+            prev = i
+
+        return index
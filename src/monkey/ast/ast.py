@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Callable, Dict, List, TextIO, Tuple
 
 from monkey import token
 
@@ -11,9 +11,24 @@ class Node(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def string(self) -> str:
+    def render(self, write: Callable[[str], None]):
+        """Pass the source form of the node, piece by piece, to `write`.
+
+        All nodes of a tree render through the same `write`, so rendering is
+        linear in the size of the output.
+        """
         raise NotImplementedError
 
+    def write(self, out: TextIO):
+        """Write the source form of the node to the text stream `out`, e.g. to
+        stream a huge program straight into a file."""
+        self.render(out.write)
+
+    def string(self) -> str:
+        out: List[str] = []
+        self.render(out.append)
+        return ''.join(out)
+
 
 class Statement(Node):
 
@@ -42,17 +57,20 @@ class Program(Node):
         else:
             return ''
 
-    def string(self) -> str:
-        out = ''
-
+    def render(self, write: Callable[[str], None]):
         for s in self.statements:
-            out += s.string()
-
-        return out
+            s.render(write)
 
 
 class Identifier(Expression):
 
+    # Inline cache for Environment.lookup: the depth this name was last
+    # found at and a weak reference to the outer environment of the lookup,
+    # valid while Environment.version is unchanged.
+    cache_version = -1
+    cache_depth = 0
+    cache_outer = None
+
     def __init__(self, token: token.Token, value: str = None):
         self.token = token
         self.value = value
@@ -63,8 +81,8 @@ class Identifier(Expression):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        return self.value
+    def render(self, write: Callable[[str], None]):
+        write(self.value)
 
 
 # Statements
@@ -82,17 +100,15 @@ class LetStatement(Statement):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        out = self.token_literal() + ' '
-        out += self.name.string()
-        out += ' = '
+    def render(self, write: Callable[[str], None]):
+        write(self.token_literal() + ' ')
+        self.name.render(write)
+        write(' = ')
 
         if self.value is not None:
-            out += self.value.string()
+            self.value.render(write)
 
-        out += ';'
-
-        return out
+        write(';')
 
 
 class ReturnStatement(Statement):
@@ -107,15 +123,13 @@ class ReturnStatement(Statement):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        out = self.token_literal() + ' '
+    def render(self, write: Callable[[str], None]):
+        write(self.token_literal() + ' ')
 
         if self.return_value is not None:
-            out += self.return_value.string()
+            self.return_value.render(write)
 
-        out += ';'
-
-        return out
+        write(';')
 
 
 class ExpressionStatement(Statement):
@@ -130,8 +144,31 @@ class ExpressionStatement(Statement):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        return self.expression.string() if self.expression is not None else ''
+    def render(self, write: Callable[[str], None]):
+        if self.expression is not None:
+            self.expression.render(write)
+
+
+class ErrorStatement(Statement):
+    """Stands in for a statement the parser could not make sense of.
+
+    `partial` is whatever the parser had built of the statement when it ran
+    into the error, if anything.
+    """
+
+    def __init__(self, token: token.Token, message: str = None, partial: Statement = None):
+        self.token = token
+        self.message = message
+        self.partial = partial
+
+    def statement_node(self):
+        pass
+
+    def token_literal(self) -> str:
+        return self.token.literal
+
+    def render(self, write: Callable[[str], None]):
+        pass
 
 
 class BlockStatement(Statement):
@@ -146,13 +183,51 @@ class BlockStatement(Statement):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        out = ''
-
+    def render(self, write: Callable[[str], None]):
         for s in self.statements:
-            out += s.string()
+            s.render(write)
+
+
+class LazyBlockStatement(BlockStatement):
+    """A function body which has only been brace-matched, not parsed.
+
+    `tokens` runs from the opening to the closing brace. The body is parsed
+    by calling `parse(tokens)` the first time its statements are needed;
+    `parse` returns the parsed BlockStatement and the parser errors.
+    """
 
-        return out
+    def __init__(self,
+                 token: token.Token,
+                 tokens: List[token.Token],
+                 parse: Callable[[List[token.Token]], Tuple[BlockStatement, List[str]]]):
+        self.token = token
+        self.tokens = tokens
+        self.parse_tokens = parse
+        self._statements: List[Statement] = None
+        self.errors: List[str] = None
+
+    def parse(self) -> List[str]:
+        """Parse the body unless already done, and return the parser errors."""
+        if self.errors is None:
+            block, self.errors = self.parse_tokens(self.tokens)
+            self._statements = block.statements
+            self.tokens = None
+        return self.errors
+
+    @property
+    def parsed(self) -> bool:
+        return self.errors is not None
+
+    @property
+    def statements(self) -> List[Statement]:
+        self.parse()
+        return self._statements
+
+    @statements.setter
+    def statements(self, statements: List[Statement]):
+        self._statements = statements
+        self.errors = []
+        self.tokens = None
 
 
 # Expressions
@@ -169,8 +244,8 @@ class Boolean(Expression):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        return self.token.literal
+    def render(self, write: Callable[[str], None]):
+        write(self.token.literal)
 
 
 class IntegerLiteral(Expression):
@@ -185,8 +260,8 @@ class IntegerLiteral(Expression):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        return self.token.literal
+    def render(self, write: Callable[[str], None]):
+        write(self.token.literal)
 
 
 class PrefixExpression(Expression):
@@ -202,15 +277,11 @@ class PrefixExpression(Expression):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        out = ''
-
-        out += '('
-        out += self.operator
-        out += self.right.string()
-        out += ')'
-
-        return out
+    def render(self, write: Callable[[str], None]):
+        write('(')
+        write(self.operator)
+        self.right.render(write)
+        write(')')
 
 
 class InfixExpression(Expression):
@@ -227,16 +298,12 @@ class InfixExpression(Expression):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        out = ''
-
-        out += '('
-        out += self.left.string()
-        out += ' ' + self.operator + ' '
-        out += self.right.string()
-        out += ')'
-
-        return out
+    def render(self, write: Callable[[str], None]):
+        write('(')
+        self.left.render(write)
+        write(' ' + self.operator + ' ')
+        self.right.render(write)
+        write(')')
 
 
 class IfExpression(Expression):
@@ -257,23 +324,23 @@ class IfExpression(Expression):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        out = ''
-
-        out += 'if'
-        out += self.condition.string()
-        out += ' '
-        out += self.consequence.string()
+    def render(self, write: Callable[[str], None]):
+        write('if')
+        self.condition.render(write)
+        write(' ')
+        self.consequence.render(write)
 
         if self.alternative is not None:
-            out += 'else '
-            out += self.alternative.string()
-
-        return out
+            write('else ')
+            self.alternative.render(write)
 
 
 class FunctionLiteral(Expression):
 
+    # The name of the first `let` the function was bound by, set by the
+    # evaluator, for profiles and reports
+    name: str = None
+
     def __init__(self, token: token.Token, parameters: List[Identifier] = None, body: BlockStatement = None):
         self.token = token
         self.parameters = parameters
@@ -285,20 +352,12 @@ class FunctionLiteral(Expression):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def string(self) -> str:
-        out = ''
-
-        params: List[str] = []
-        for p in self.parameters:
-            params.append(p.string())
-
-        out += self.token_literal()
-        out += '('
-        out += ', '.join(params)
-        out += ') '
-        out += self.body.string()
-
-        return out
+    def render(self, write: Callable[[str], None]):
+        write(self.token_literal())
+        write('(')
+        render_list(write, self.parameters)
+        write(') ')
+        self.body.render(write)
 
 
 class CallExpression(Expression):
@@ -314,19 +373,11 @@ class CallExpression(Expression):
     def token_literal(self):
         return self.token.literal
 
-    def string(self):
-        out = ''
-
-        args: List[str] = []
-        for a in self.arguments:
-            args.append(a.string())
-
-        out += self.function.string()
-        out += '('
-        out += ', '.join(args)
-        out += ')'
-
-        return out
+    def render(self, write: Callable[[str], None]):
+        self.function.render(write)
+        write('(')
+        render_list(write, self.arguments)
+        write(')')
 
 
 class StringLiteral(Expression):
@@ -341,8 +392,8 @@ class StringLiteral(Expression):
     def token_literal(self):
         return self.token.literal
 
-    def string(self):
-        return self.token.literal
+    def render(self, write: Callable[[str], None]):
+        write(self.token.literal)
 
 
 class ArrayLiteral(Expression):
@@ -357,18 +408,10 @@ class ArrayLiteral(Expression):
     def token_literal(self):
         return self.token.literal
 
-    def string(self):
-        out = ''
-
-        elements: List[str] = []
-        for el in self.elements:
-            elements.append(el.string())
-
-        out += '['
-        out += ', '.join(elements)
-        out += ']'
-
-        return out
+    def render(self, write: Callable[[str], None]):
+        write('[')
+        render_list(write, self.elements)
+        write(']')
 
 
 class IndexExpression(Expression):
@@ -384,16 +427,12 @@ class IndexExpression(Expression):
     def token_literal(self):
         return self.token.literal
 
-    def string(self):
-        out = ''
-
-        out += '('
-        out += self.left.string()
-        out += '['
-        out += self.index.string()
-        out += '])'
-
-        return out
+    def render(self, write: Callable[[str], None]):
+        write('(')
+        self.left.render(write)
+        write('[')
+        self.index.render(write)
+        write('])')
 
 
 class HashLiteral(Expression):
@@ -408,15 +447,20 @@ class HashLiteral(Expression):
     def token_literal(self):
         return self.token.literal
 
-    def string(self):
-        out = ''
-
-        pairs: List[str]
-        for key, value in self.pairs.items():
-            pairs.append(key.string() + ':' + value.string())
-
-        out += '{'
-        out += ', '.join(pairs)
-        out += '}'
-
-        return out
+    def render(self, write: Callable[[str], None]):
+        write('{')
+        for i, (key, value) in enumerate(self.pairs.items()):
+            if i > 0:
+                write(', ')
+            key.render(write)
+            write(':')
+            value.render(write)
+        write('}')
+
+
+def render_list(write: Callable[[str], None], nodes: List[Node]):
+    """Render `nodes` separated by commas."""
+    for i, node in enumerate(nodes):
+        if i > 0:
+            write(', ')
+        node.render(write)
@@ -0,0 +1,156 @@
+from typing import Dict, FrozenSet, List, Set
+
+from monkey import token
+from . import ast
+
+
+def free_variables(fn: ast.FunctionLiteral) -> List[str]:
+    """Return the names a function literal refers to without binding them,
+    in order of first use.
+
+    A name is bound by the function if it is a parameter, or if it is set by
+    a `let` directly in the body before it is used. Names set by a `let`
+    inside an if block are not treated as bound, since the block might not
+    run. Nested functions run later, so their free names are only free here
+    if the body does not bind them anywhere. The result is cached on the
+    node.
+
+    A lazy body which has not been parsed yet is not parsed here: every
+    identifier in its tokens, other than the parameters, counts as free.
+    """
+    names = getattr(fn, 'free_names', None)
+    if names is not None:
+        return names
+
+    body = fn.body
+    if body.__class__ is ast.LazyBlockStatement and not body.parsed:
+        params = {p.value for p in fn.parameters or []}
+        return list(dict.fromkeys(t.literal for t in body.tokens
+                                  if t.type == token.IDENT and t.literal not in params))
+
+    names = fn.free_names = _FreeVariables(fn).names()
+    return names
+
+
+def let_names(body: ast.BlockStatement) -> FrozenSet[str]:
+    """Return the names a function body binds with `let`, including lets in
+    if blocks but not in nested functions. The result is cached on the node.
+    """
+    names = getattr(body, 'let_names', None)
+    if names is None:
+        lets: Set[str] = set()
+        _collect_lets(body, lets)
+        names = body.let_names = frozenset(lets)
+    return names
+
+
+def _collect_lets(node: ast.Node, lets: Set[str]):
+    cls = node.__class__
+
+    if issubclass(cls, ast.BlockStatement):
+        for stmt in node.statements:
+            _collect_lets(stmt, lets)
+    elif cls is ast.LetStatement:
+        if node.name is not None:
+            lets.add(node.name.value)
+        _collect_lets(node.value, lets)
+    elif cls is ast.ExpressionStatement:
+        _collect_lets(node.expression, lets)
+    elif cls is ast.ReturnStatement:
+        _collect_lets(node.return_value, lets)
+    elif cls is ast.ErrorStatement:
+        _collect_lets(node.partial, lets)
+    elif cls is ast.IfExpression:
+        _collect_lets(node.condition, lets)
+        _collect_lets(node.consequence, lets)
+        _collect_lets(node.alternative, lets)
+    elif cls is ast.PrefixExpression:
+        _collect_lets(node.right, lets)
+    elif cls is ast.InfixExpression:
+        _collect_lets(node.left, lets)
+        _collect_lets(node.right, lets)
+    elif cls is ast.CallExpression:
+        _collect_lets(node.function, lets)
+        for arg in node.arguments or []:
+            _collect_lets(arg, lets)
+    elif cls is ast.ArrayLiteral:
+        for element in node.elements or []:
+            _collect_lets(element, lets)
+    elif cls is ast.IndexExpression:
+        _collect_lets(node.left, lets)
+        _collect_lets(node.index, lets)
+    elif cls is ast.HashLiteral:
+        for key, value in (node.pairs or {}).items():
+            _collect_lets(key, lets)
+            _collect_lets(value, lets)
+
+
+class _FreeVariables:
+
+    def __init__(self, fn: ast.FunctionLiteral):
+        self.bound: Set[str] = {p.value for p in fn.parameters or []}
+        self.local: Set[str] = set(self.bound)
+        for stmt in fn.body.statements:
+            if stmt.__class__ is ast.LetStatement and stmt.name is not None:
+                self.local.add(stmt.name.value)
+
+        self.free: Dict[str, None] = {}
+        self.block(fn.body, True)
+
+    def names(self) -> List[str]:
+        return list(self.free)
+
+    def block(self, block: ast.BlockStatement, top: bool):
+        for stmt in block.statements:
+            if stmt.__class__ is ast.LetStatement:
+                self.node(stmt.value)
+                if top and stmt.name is not None:
+                    self.bound.add(stmt.name.value)
+            else:
+                self.node(stmt)
+
+    def node(self, node: ast.Node):
+        cls = node.__class__
+
+        if node is None:
+            return
+        elif cls is ast.Identifier:
+            if node.value not in self.bound:
+                self.free[node.value] = None
+        elif cls is ast.FunctionLiteral:
+            for name in free_variables(node):
+                if name not in self.local:
+                    self.free[name] = None
+        elif issubclass(cls, ast.BlockStatement):
+            self.block(node, False)
+        elif cls is ast.LetStatement:
+            self.node(node.value)
+        elif cls is ast.ReturnStatement:
+            self.node(node.return_value)
+        elif cls is ast.ExpressionStatement:
+            self.node(node.expression)
+        elif cls is ast.ErrorStatement:
+            self.node(node.partial)
+        elif cls is ast.PrefixExpression:
+            self.node(node.right)
+        elif cls is ast.InfixExpression:
+            self.node(node.left)
+            self.node(node.right)
+        elif cls is ast.IfExpression:
+            self.node(node.condition)
+            self.node(node.consequence)
+            self.node(node.alternative)
+        elif cls is ast.CallExpression:
+            self.node(node.function)
+            for arg in node.arguments or []:
+                self.node(arg)
+        elif cls is ast.ArrayLiteral:
+            for element in node.elements or []:
+                self.node(element)
+        elif cls is ast.IndexExpression:
+            self.node(node.left)
+            self.node(node.index)
+        elif cls is ast.HashLiteral:
+            for key, value in (node.pairs or {}).items():
+                self.node(key)
+                self.node(value)
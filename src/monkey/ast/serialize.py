@@ -0,0 +1,255 @@
+from typing import BinaryIO, Dict, List, Tuple
+
+from monkey import token
+from . import ast
+
+# A serialised program looks like this, where every number is an unsigned
+# LEB128 varint and every string is a varint length followed by UTF-8 bytes:
+#
+#   MAGIC  version
+#   tag count  tag name ...      (names of the node classes used)
+#   string count  string ...     (every string in the program, deduplicated)
+#   root node
+#
+# A node is a varint tag (0 for None, otherwise index + 1 into the tag
+# table), its token (type, literal, start, length) and then its fields as given
+# by _FIELDS below. Strings are referenced by index + 1 into the string table,
+# lists are a varint count + 1 (0 for None) followed by their items. Token
+# starts are zigzag encoded deltas from the start of the previous token.
+
+MAGIC = b'MKYC'
+FORMAT_VERSION = 1
+
+_NODE = 'node'
+_NODES = 'nodes'
+_STRING = 'string'
+_INT = 'int'
+_BOOL = 'bool'
+_PAIRS = 'pairs'
+
+_FIELDS: Dict[str, List[Tuple[str, str]]] = {
+    'Program': [('statements', _NODES)],
+    'Identifier': [('value', _STRING)],
+    'LetStatement': [('name', _NODE), ('value', _NODE)],
+    'ReturnStatement': [('return_value', _NODE)],
+    'ExpressionStatement': [('expression', _NODE)],
+    'ErrorStatement': [('message', _STRING), ('partial', _NODE)],
+    'BlockStatement': [('statements', _NODES)],
+    'Boolean': [('value', _BOOL)],
+    'IntegerLiteral': [('value', _INT)],
+    'PrefixExpression': [('operator', _STRING), ('right', _NODE)],
+    'InfixExpression': [('left', _NODE), ('operator', _STRING), ('right', _NODE)],
+    'IfExpression': [('condition', _NODE), ('consequence', _NODE), ('alternative', _NODE)],
+    'FunctionLiteral': [('parameters', _NODES), ('body', _NODE)],
+    'CallExpression': [('function', _NODE), ('arguments', _NODES)],
+    'StringLiteral': [('value', _STRING)],
+    'ArrayLiteral': [('elements', _NODES)],
+    'IndexExpression': [('left', _NODE), ('index', _NODE)],
+    'HashLiteral': [('pairs', _PAIRS)],
+}
+
+
+class _Encoder:
+
+    def __init__(self):
+        self.out = bytearray()
+        self.tags: Dict[str, int] = {}
+        self.strings: Dict[str, int] = {}
+        self.last_start = 0
+
+    def varint(self, n: int):
+        out = self.out
+        while n > 0x7f:
+            out.append((n & 0x7f) | 0x80)
+            n >>= 7
+        out.append(n)
+
+    def string(self, s: str):
+        if s is None:
+            self.varint(0)
+            return
+        index = self.strings.get(s)
+        if index is None:
+            index = self.strings[s] = len(self.strings)
+        self.varint(index + 1)
+
+    def node(self, node: ast.Node):
+        if node is None:
+            self.varint(0)
+            return
+
+        name = node.__class__.__name__
+        if name == 'LazyBlockStatement':
+            name = 'BlockStatement'
+        fields = _FIELDS.get(name)
+        if fields is None:
+            raise ValueError('cannot serialise node {}'.format(name))
+        tag = self.tags.get(name)
+        if tag is None:
+            tag = self.tags[name] = len(self.tags)
+        self.varint(tag + 1)
+
+        # Programs have no token of their own
+        if name != 'Program':
+            tok = node.token
+            self.string(tok.type)
+            self.string(tok.literal)
+            delta = tok.start - self.last_start
+            self.varint(delta << 1 if delta >= 0 else (-delta << 1) - 1)
+            self.varint(tok.end - tok.start)
+            self.last_start = tok.start
+
+        for attr, kind in fields:
+            value = getattr(node, attr)
+            if kind == _NODE:
+                self.node(value)
+            elif kind == _NODES:
+                if value is None:
+                    self.varint(0)
+                else:
+                    self.varint(len(value) + 1)
+                    for item in value:
+                        self.node(item)
+            elif kind == _STRING:
+                self.string(value)
+            elif kind == _INT:
+                self.varint(0 if value is None else value + 1)
+            elif kind == _BOOL:
+                self.varint(0 if value is None else int(value) + 1)
+            elif kind == _PAIRS:
+                if value is None:
+                    self.varint(0)
+                else:
+                    self.varint(len(value) + 1)
+                    for key, val in value.items():
+                        self.node(key)
+                        self.node(val)
+
+    def result(self) -> bytes:
+        body = self.out
+        self.out = bytearray(MAGIC)
+        self.varint(FORMAT_VERSION)
+        for table in (self.tags, self.strings):
+            self.varint(len(table))
+            for s in table:
+                b = s.encode('utf-8')
+                self.varint(len(b))
+                self.out += b
+        return bytes(self.out + body)
+
+
+class _Decoder:
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+        self.last_start = 0
+
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError('not a serialised monkey program')
+        self.pos = len(MAGIC)
+
+        version = self.varint()
+        if version != FORMAT_VERSION:
+            raise ValueError('unsupported format version {}, expected {}'.format(version, FORMAT_VERSION))
+
+        self.tags: List[Tuple[type, List[Tuple[str, str]]]] = []
+        for name in self.table():
+            if name not in _FIELDS:
+                raise ValueError('unknown node type {}'.format(name))
+            self.tags.append((getattr(ast, name), _FIELDS[name]))
+
+        self.strings: List[str] = self.table()
+
+    def varint(self) -> int:
+        data = self.data
+        n = 0
+        shift = 0
+        while True:
+            b = data[self.pos]
+            self.pos += 1
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def table(self) -> List[str]:
+        items: List[str] = []
+        for _ in range(self.varint()):
+            length = self.varint()
+            items.append(self.data[self.pos:self.pos + length].decode('utf-8'))
+            self.pos += length
+        return items
+
+    def string(self):
+        index = self.varint()
+        return self.strings[index - 1] if index > 0 else None
+
+    def node(self):
+        tag = self.varint()
+        if tag == 0:
+            return None
+
+        cls, fields = self.tags[tag - 1]
+        node = cls.__new__(cls)
+
+        if cls is not ast.Program:
+            tok_type = self.string()
+            literal = self.string()
+            delta = self.varint()
+            start = self.last_start + (delta >> 1 if delta & 1 == 0 else -((delta + 1) >> 1))
+            end = start + self.varint()
+            node.token = token.Token(tok_type, literal, start, end)
+            self.last_start = start
+
+        for attr, kind in fields:
+            if kind == _NODE:
+                value = self.node()
+            elif kind == _NODES:
+                n = self.varint()
+                value = [self.node() for _ in range(n - 1)] if n > 0 else None
+            elif kind == _STRING:
+                value = self.string()
+            elif kind == _INT:
+                n = self.varint()
+                value = n - 1 if n > 0 else None
+            elif kind == _BOOL:
+                n = self.varint()
+                value = n == 2 if n > 0 else None
+            else:
+                n = self.varint()
+                value = None
+                if n > 0:
+                    value = {}
+                    for _ in range(n - 1):
+                        key = self.node()
+                        value[key] = self.node()
+            setattr(node, attr, value)
+
+        return node
+
+
+def dumps(program: ast.Program) -> bytes:
+    """Serialise a program to the compact binary format."""
+    e = _Encoder()
+    e.node(program)
+    return e.result()
+
+
+def loads(data: bytes) -> ast.Program:
+    """Rebuild a program serialised by dumps.
+
+    Raises ValueError if the data is not in the current format version.
+    """
+    try:
+        return _Decoder(data).node()
+    except IndexError:
+        raise ValueError('truncated serialised monkey program')
+
+
+def dump(program: ast.Program, fp: BinaryIO):
+    fp.write(dumps(program))
+
+
+def load(fp: BinaryIO) -> ast.Program:
+    return loads(fp.read())
@@ -0,0 +1,124 @@
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, NamedTuple, Union
+
+from monkey import ast, evaluator, lexer, object, parser
+
+
+class Source(NamedTuple):
+    """A script given by its source rather than by a path."""
+    name: str
+    text: str
+
+
+Script = Union[str, Source]  # the path of a script, or its source
+
+
+class ScriptResult:
+    """The outcome of one script of a batch.
+
+    `result` is the inspect() form of the value the script evaluated to,
+    `output` is what it printed, and `error` the parse or evaluation error
+    which stopped it. `timings` holds the seconds spent in each phase.
+    """
+
+    def __init__(self, name: str, result: str = None, output: str = '', error: str = None,
+                 timings: Dict[str, float] = None):
+        self.name = name
+        self.result = result
+        self.output = output
+        self.error = error
+        self.timings = timings if timings is not None else {}
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        return 'ScriptResult({!r}, result={!r}, error={!r})'.format(self.name, self.result, self.error)
+
+
+# Programs parsed by this worker, by source hash, so repeated sources in a
+# batch, or in later batches on the same pool, are parsed once
+programs = object.LRUCache(256)
+
+
+def warm_up():
+    """Initialize a worker process, before it runs any script."""
+    # Monkey recursion costs several Python frames per call
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+
+def parse_source(source: Source, timings: Dict[str, float]) -> ast.Program:
+    key = parser.source_hash(source.text)
+    program = programs.get(key)
+    if program is not None:
+        return program
+
+    start = time.perf_counter()
+    p = parser.Parser(lexer.Lexer(source.text))
+    program = p.parse_program()
+    timings['parse'] = time.perf_counter() - start
+    if len(p.errors) != 0:
+        raise SyntaxError(p.errors[0])
+
+    programs.put(key, program)
+    return program
+
+
+def run_script(script: Script, use_cache: bool = True, timeout: float = None) -> ScriptResult:
+    """Parse and evaluate one script in the current process."""
+    name = script.name if isinstance(script, Source) else script
+    timings: Dict[str, float] = {}
+
+    try:
+        if isinstance(script, Source):
+            program = parse_source(script, timings)
+        else:
+            program, errors = parser.parse_file(script, use_cache, timings)
+            if len(errors) != 0:
+                raise SyntaxError(errors[0])
+    except (OSError, UnicodeDecodeError, SyntaxError) as e:
+        return ScriptResult(name, error=str(e), timings=timings)
+
+    budget = evaluator.Budget(timeout=timeout) if timeout is not None else None
+    start = time.perf_counter()
+    with evaluator.output.capture() as output:
+        evaluated = evaluator.eval(program, object.Environment(), budget)
+    timings['eval'] = time.perf_counter() - start
+
+    if issubclass(evaluated.__class__, object.Error):
+        return ScriptResult(name, output=output.getvalue(), error=evaluated.message, timings=timings)
+    result = evaluated.inspect() if evaluated is not None else None
+    return ScriptResult(name, result, output.getvalue(), timings=timings)
+
+
+def run_batch(scripts: Iterable[Script], max_workers: int = None, executor: Executor = None,
+              use_cache: bool = True, timeout: float = None) -> Iterator[ScriptResult]:
+    """Run independent scripts across a process pool, yielding each result
+    as soon as its script has finished.
+
+    Pass an `executor` to keep a pool of warm workers across batches; it
+    should have been created with `warm_up` as its initializer. Otherwise a
+    pool of `max_workers` processes is created for the batch. `timeout`
+    limits the evaluation time of every script, see evaluator.Budget.
+    """
+    if executor is not None:
+        yield from _run(executor, scripts, use_cache, timeout)
+        return
+
+    with ProcessPoolExecutor(max_workers, initializer=warm_up) as executor:
+        yield from _run(executor, scripts, use_cache, timeout)
+
+
+def _run(executor: Executor, scripts: Iterable[Script], use_cache: bool,
+         timeout: float) -> Iterator[ScriptResult]:
+    futures = {executor.submit(run_script, script, use_cache, timeout): script for script in scripts}
+    for future in as_completed(futures):
+        try:
+            yield future.result()
+        except Exception as e:  # the worker died, e.g. by running out of stack
+            script = futures[future]
+            name = script.name if isinstance(script, Source) else script
+            yield ScriptResult(name, error='{}: {}'.format(e.__class__.__name__, e))
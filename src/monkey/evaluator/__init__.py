@@ -1,2 +1,5 @@
 from .builtins import *
 from .evaluator import *
+from .budget import *
+from .profiler import *
+from .output import *
@@ -0,0 +1,56 @@
+import sys
+import time
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class Budget:
+    """Limits on the work of one evaluation, for running untrusted scripts.
+
+    `max_steps` limits the number of function calls, `timeout` the wall
+    clock seconds and `max_objects` the growth in live Python objects (as
+    counted by sys.getallocatedblocks), a rough measure of the memory the
+    script holds. Any limit may be None. Pass the budget to evaluator.eval,
+    which returns an error object once a limit is exceeded.
+
+    Only the step count is updated per call. The other limits are checked
+    every `check_interval` calls, and a single builtin call such as a push
+    onto a huge array is never interrupted. On benchmarks/programs/fib.monkey
+    budgeted runs were not measurably slower than unbudgeted ones, and
+    evaluation without a budget pays a single check per call.
+    """
+
+    check_interval = 100
+
+    def __init__(self, max_steps: int = None, timeout: float = None, max_objects: int = None):
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.max_objects = max_objects
+
+        self.steps = 0
+        self.next_check = 0
+        self.deadline: float = None
+        self.base_objects = 0
+
+    def start(self):
+        self.steps = 0
+        self.deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        self.base_objects = sys.getallocatedblocks() if self.max_objects is not None else 0
+        self.schedule()
+
+    def schedule(self):
+        self.next_check = self.steps + self.check_interval
+        if self.max_steps is not None and self.next_check > self.max_steps + 1:
+            self.next_check = self.max_steps + 1
+
+    def check(self):
+        """Raise BudgetExceeded if a limit was exceeded."""
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise BudgetExceeded('step limit of {} exceeded'.format(self.max_steps))
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded('time limit of {}s exceeded'.format(self.timeout))
+        if self.max_objects is not None and sys.getallocatedblocks() - self.base_objects > self.max_objects:
+            raise BudgetExceeded('object limit of {} exceeded'.format(self.max_objects))
+        self.schedule()
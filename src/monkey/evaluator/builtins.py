@@ -1,7 +1,11 @@
 import copy
-from typing import Dict, List
+import json
+import mmap
+import os
+from typing import Any, Dict, Iterator, List, TextIO
 
 from monkey import evaluator, object
+from .output import output
 
 
 def _len(*args) -> object.Object:
@@ -18,7 +22,7 @@ def _len(*args) -> object.Object:
 
 def puts(*args: List[object.Object]) -> object.Object:
     for arg in args:
-        print(arg.inspect())
+        output.write(arg.inspect() + '\n')
 
     return evaluator.NULL
 
@@ -26,6 +30,9 @@ def puts(*args: List[object.Object]) -> object.Object:
 def first(*args: List[object.Object]) -> object.Object:
     if len(args) != 1:
         return evaluator.new_error('wrong number of arguments. got={}, want=1', len(args))
+    if args[0].type() == object.SEQUENCE_OBJ:
+        head = args[0].first()
+        return head if head is not None else evaluator.NULL
     if args[0].type() != object.ARRAY_OBJ:
         return evaluator.new_error('argument to `first` must be ARRAY, got {}'.format(args[0].type()))
 
@@ -53,6 +60,9 @@ def last(*args: List[object.Object]) -> object.Object:
 def rest(*args: List[object.Object]) -> object.Object:
     if len(args) != 1:
         return evaluator.new_error('wrong number of arguments. got={}, want=1', len(args))
+    if args[0].type() == object.SEQUENCE_OBJ:
+        tail = args[0].rest()
+        return tail if tail is not None else evaluator.NULL
     if args[0].type() != object.ARRAY_OBJ:
         return evaluator.new_error('argument to `rest` must be ARRAY, got {}'.format(args[0].type()))
 
@@ -79,12 +89,163 @@ def push(*args: List[object.Object]) -> object.Object:
     return object.Array(new_elements)
 
 
+def memoize(*args: List[object.Object]) -> object.Object:
+    if len(args) not in (1, 2):
+        return evaluator.new_error('wrong number of arguments. got={}, want=1 or 2', len(args))
+    if args[0].type() not in (object.FUNCTION_OBJ, object.BUILTIN_OBJ):
+        return evaluator.new_error('argument to `memoize` must be FUNCTION, got {}'.format(args[0].type()))
+
+    if len(args) == 1:
+        return object.MemoizedFunction(args[0])
+
+    if args[1].type() != object.INTEGER_OBJ or args[1].value < 1:
+        return evaluator.new_error('cache size of `memoize` must be a positive INTEGER, got {}'.format(
+            args[1].inspect()))
+    return object.MemoizedFunction(args[0], args[1].value)
+
+
+# Files at least this large are read through mmap
+MMAP_THRESHOLD = 1 << 20
+
+
+def read_file(*args: List[object.Object]) -> object.Object:
+    if len(args) != 1:
+        return evaluator.new_error('wrong number of arguments. got={}, want=1', len(args))
+    if args[0].type() != object.STRING_OBJ:
+        return evaluator.new_error('argument to `read_file` must be STRING, got {}'.format(args[0].type()))
+
+    path = args[0].value
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < MMAP_THRESHOLD:
+                return object.String(f.read().decode('utf-8'))
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return object.String(str(m, 'utf-8'))
+    except (OSError, UnicodeDecodeError) as e:
+        return evaluator.new_error('could not read {}: {}', path, e)
+
+
+def write_file(*args: List[object.Object]) -> object.Object:
+    if len(args) != 2:
+        return evaluator.new_error('wrong number of arguments. got={}, want=2', len(args))
+    if args[0].type() != object.STRING_OBJ or args[1].type() != object.STRING_OBJ:
+        return evaluator.new_error('arguments to `write_file` must be STRING, got {} and {}'.format(
+            args[0].type(), args[1].type()))
+
+    path = args[0].value
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(args[1].value)
+    except OSError as e:
+        return evaluator.new_error('could not write {}: {}', path, e)
+    return evaluator.NULL
+
+
+def read_lines(*args: List[object.Object]) -> object.Object:
+    if len(args) != 1:
+        return evaluator.new_error('wrong number of arguments. got={}, want=1', len(args))
+    if args[0].type() != object.STRING_OBJ:
+        return evaluator.new_error('argument to `read_lines` must be STRING, got {}'.format(args[0].type()))
+
+    path = args[0].value
+    try:
+        f = open(path, encoding='utf-8')
+    except OSError as e:
+        return evaluator.new_error('could not read {}: {}', path, e)
+    return object.Sequence(_lines(f))
+
+
+def _lines(f: TextIO) -> Iterator[object.Object]:
+    with f:
+        try:
+            for line in f:
+                yield object.String(line.rstrip('\r\n'))
+        except (OSError, UnicodeDecodeError) as e:
+            yield evaluator.new_error('could not read {}: {}', f.name, e)
+
+
+def json_parse(*args: List[object.Object]) -> object.Object:
+    if len(args) not in (1, 2):
+        return evaluator.new_error('wrong number of arguments. got={}, want=1 or 2', len(args))
+    if args[0].type() != object.STRING_OBJ:
+        return evaluator.new_error('argument to `json_parse` must be STRING, got {}'.format(args[0].type()))
+    lazy = len(args) == 2 and evaluator.is_truthy(args[1])
+
+    try:
+        data = json.loads(args[0].value, parse_float=_reject_number, parse_constant=_reject_number)
+    except ValueError as e:
+        return evaluator.new_error('could not parse JSON: {}', e)
+    return _from_json(data, lazy)
+
+
+def _reject_number(literal: str):
+    raise ValueError('unsupported number {}'.format(literal))
+
+
+def _from_json(value: Any, lazy: bool) -> object.Object:
+    cls = value.__class__
+    if cls is str:
+        return object.String(value)
+    elif cls is int:
+        return object.Integer(value)
+    elif cls is dict:
+        if lazy:
+            return object.LazyHash(value, _lazy_json_pairs)
+        return object.Hash(_json_pairs(value, False))
+    elif cls is list:
+        return object.Array([_from_json(v, lazy) for v in value])
+    elif value is True:
+        return evaluator.TRUE
+    elif value is False:
+        return evaluator.FALSE
+    return evaluator.NULL
+
+
+def _json_pairs(value: Dict[str, Any], lazy: bool) -> Dict[object.HashKey, object.HashPair]:
+    pairs = {}
+    for k, v in value.items():
+        key = object.String(k)
+        pairs[key.hash_key()] = object.HashPair(key, _from_json(v, lazy))
+    return pairs
+
+
+def _lazy_json_pairs(value: Dict[str, Any]) -> Dict[object.HashKey, object.HashPair]:
+    return _json_pairs(value, True)
+
+
+def json_dump(*args: List[object.Object]) -> object.Object:
+    if len(args) != 1:
+        return evaluator.new_error('wrong number of arguments. got={}, want=1', len(args))
+
+    try:
+        return object.String(json.dumps(_to_json(args[0]), ensure_ascii=False, separators=(',', ':')))
+    except TypeError as e:
+        return evaluator.new_error('could not convert to JSON: {}', e)
+
+
+def _to_json(obj: object.Object) -> Any:
+    cls = obj.__class__
+    if cls is object.String or cls is object.Integer or cls is object.Boolean:
+        return obj.value
+    elif cls is object.Null:
+        return None
+    elif cls is object.Array:
+        return [_to_json(e) for e in obj.elements]
+    elif cls is object.LazyHash:
+        # A hash cannot change, so its JSON document still describes it
+        return obj.data
+    elif cls is object.Hash:
+        return {pair.key.value: _to_json(pair.value) for pair in obj.pairs.values()}
+    raise TypeError('unsupported type {}'.format(obj.type()))
+
+
 builtins: Dict[str, object.Builtin] = {
     'len': object.Builtin(
         _len
     ),
     'puts': object.Builtin(
-        puts
+        puts, pure=False
     ),
     'first': object.Builtin(
         first
@@ -98,4 +259,22 @@ builtins: Dict[str, object.Builtin] = {
     'push': object.Builtin(
         push
     ),
+    'memoize': object.Builtin(
+        memoize
+    ),
+    'read_file': object.Builtin(
+        read_file, pure=False
+    ),
+    'write_file': object.Builtin(
+        write_file, pure=False
+    ),
+    'read_lines': object.Builtin(
+        read_lines, pure=False
+    ),
+    'json_parse': object.Builtin(
+        json_parse
+    ),
+    'json_dump': object.Builtin(
+        json_dump
+    ),
 }
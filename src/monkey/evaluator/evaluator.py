@@ -1,14 +1,65 @@
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 
 from monkey import ast, object
+from .budget import Budget, BudgetExceeded
 from .builtins import builtins
+from .output import output
+from .profiler import NodeCounters, Profiler
 
 NULL = object.Null()
 TRUE = object.Boolean(True)
 FALSE = object.Boolean(False)
 
+# Environments of function calls, recycled by apply_function
+frames = object.EnvironmentPool()
 
-def eval(node: ast.Node, env: object.Environment) -> Union[object.Object, None]:
+# Result cache of automatic memoization, see use_pure_function_cache
+pure_cache: Union[object.PureFunctionCache, None] = None
+
+
+def use_pure_function_cache(cache: Union[object.PureFunctionCache, None]):
+    """Turn on automatic memoization with `cache`, or turn it off with None.
+
+    While on, the result of every function call without side effects is
+    cached, keyed on the function, the values of its free variables and the
+    hash keys of its arguments.
+    """
+    global pure_cache
+    pure_cache = cache
+
+
+# Profiler of all function calls, see use_profiler
+profiler: Union[Profiler, None] = None
+
+
+def use_profiler(p: Union[Profiler, None]):
+    """Profile all function calls with `p` from now on, or stop with None."""
+    global profiler
+    profiler = p
+
+
+# Counters of all node evaluations, see use_node_counters
+node_counters: Union[NodeCounters, None] = None
+
+
+def use_node_counters(counters: Union[NodeCounters, None]):
+    """Count all node evaluations with `counters` from now on, or stop with None."""
+    global node_counters
+    node_counters = counters
+
+
+# The budget of the evaluation in progress, see eval_with_budget
+active_budget: Union[Budget, None] = None
+
+
+def eval(node: ast.Node, env: object.Environment, budget: Budget = None) -> Union[object.Object, None]:
+    if budget is not None:
+        return eval_with_budget(node, env, budget)
+
+    if node_counters is not None:
+        if node_counters.current is not node:
+            return node_counters.count(node, env, eval)
+        node_counters.current = None
 
     # Statements
 
@@ -31,8 +82,13 @@ def eval(node: ast.Node, env: object.Environment) -> Union[object.Object, None]:
         val = eval(node.value, env)
         if is_error(val):
             return val
+        if val.__class__ is object.Function and val.literal is not None and val.literal.name is None:
+            val.literal.name = node.name.value
         env.set(node.name.value, val)
 
+    elif issubclass(node.__class__, ast.ErrorStatement):
+        return new_error('parse error: {}', node.message)
+
     # Expressions
 
     elif issubclass(node.__class__, ast.IntegerLiteral):
@@ -70,7 +126,7 @@ def eval(node: ast.Node, env: object.Environment) -> Union[object.Object, None]:
     elif issubclass(node.__class__, ast.FunctionLiteral):
         params = node.parameters
         body = node.body
-        return object.Function(params, body, env)
+        return object.Function(params, body, closure_environment(node, env), node)
 
     elif issubclass(node.__class__, ast.CallExpression):
         function = eval(node.function, env)
@@ -104,18 +160,41 @@ def eval(node: ast.Node, env: object.Environment) -> Union[object.Object, None]:
     return None
 
 
+def eval_with_budget(node: ast.Node, env: object.Environment, budget: Budget) -> Union[object.Object, None]:
+    """Evaluate `node` within the limits of `budget`.
+
+    Evaluation stops as soon as a limit is exceeded, or the script recurses
+    too deep for Python, and the error object describing it is returned.
+    """
+    global active_budget
+    outer = active_budget
+    active_budget = budget
+    budget.start()
+    try:
+        return eval(node, env)
+    except BudgetExceeded as e:
+        return new_error('{}', e)
+    except RecursionError:
+        return new_error('maximum recursion depth exceeded')
+    finally:
+        active_budget = outer
+
+
 def eval_program(program: ast.Program, env: object.Environment) -> object.Object:
     result: object.Object = None
 
-    for statement in program.statements:
-        result = eval(statement, env)
+    try:
+        for statement in program.statements:
+            result = eval(statement, env)
 
-        if issubclass(result.__class__, object.ReturnValue):
-            return result.value
-        elif issubclass(result.__class__, object.Error):
-            return result
+            if issubclass(result.__class__, object.ReturnValue):
+                return result.value
+            elif issubclass(result.__class__, object.Error):
+                return result
 
-    return result
+        return result
+    finally:
+        output.flush()
 
 
 def eval_block_statement(block: ast.BlockStatement, env: object.Environment) -> object.Object:
@@ -225,7 +304,7 @@ def eval_if_expression(ie: ast.IfExpression, env: object.Environment) -> Union[o
 
 
 def eval_identifier(node: ast.Identifier, env: object.Environment) -> object.Object:
-    val, ok = env.get(node.value)
+    val, ok = env.lookup(node)
     if ok:
         return val
 
@@ -268,22 +347,155 @@ def eval_expressions(exps: List[ast.Expression], env: object.Environment) -> Lis
     return result
 
 
+def closure_environment(fn: ast.FunctionLiteral, env: object.Environment) -> object.Environment:
+    """Return the environment a function created in `env` should close over.
+
+    Instead of the whole chain of enclosing environments, the closure gets a
+    flat environment holding only its free variables, copied from where they
+    are bound now, and enclosed by the global environment, where globals are
+    still looked up when used. The closure keeps `env` itself if one of its
+    free variables is not bound yet (e.g. a local function calling itself),
+    or is bound with `let` by an enclosing function, which might bind it
+    again after the closure was created.
+
+    The global environment is the outermost one, or a fork of a frozen
+    environment, in which case the frozen environments count as globals too.
+    """
+    if env.outer is None or env.forked:
+        return env
+
+    globals = env.outer
+    while globals.outer is not None and not globals.forked:
+        globals = globals.outer
+
+    store: Dict[str, object.Object] = {}
+    for name in ast.free_variables(fn):
+        e = env
+        while e is not globals:
+            if name in e.lets:
+                env.captured = True
+                return env
+            if name in e.store:
+                break
+            e = e.outer
+        if e is not globals:
+            store[name] = e.store[name]
+        elif name not in builtins and not globals.get(name)[1]:
+            env.captured = True
+            return env
+
+    return object.Environment(store, globals)
+
+
 def apply_function(fn: object.Object, args: List[object.Object]) -> object.Object:
+    # Monkey has no loops, so all unbounded work goes through calls, and
+    # counting the budget's steps here is enough to stop any script
+    if active_budget is not None:
+        active_budget.steps += 1
+        if active_budget.steps >= active_budget.next_check:
+            active_budget.check()
+
+    if profiler is not None and (fn.__class__ is object.Function or fn.__class__ is object.Builtin):
+        return profiler.call(fn, args, invoke_function)
+    return invoke_function(fn, args)
+
+
+def invoke_function(fn: object.Object, args: List[object.Object]) -> object.Object:
     if issubclass(fn.__class__, object.Function):
-        extended_env = extend_function_env(fn, args)
-        evaluated = eval(fn.body, extended_env)
-        return unwrap_return_value(evaluated)
+        if pure_cache is not None and fn.pure:
+            return apply_pure_function(fn, args)
+        return call_function(fn, args)
+    elif fn.__class__ is object.MemoizedFunction:
+        return apply_memoized_function(fn, args)
     elif issubclass(fn.__class__, object.Builtin):
+        if not fn.pure and pure_cache is not None:
+            pure_cache.side_effects += 1
         return fn.fn(*args)
     else:
         return new_error('not a function: {}'.format(fn.type()))
 
 
+def call_function(fn: object.Function, args: List[object.Object]) -> object.Object:
+    if fn.body.__class__ is ast.LazyBlockStatement:
+        errors = fn.body.parse()
+        if len(errors) > 0:
+            return new_error('parse error in function body: {}', errors[0])
+    extended_env = extend_function_env(fn, args)
+    evaluated = eval(fn.body, extended_env)
+    frames.release(extended_env)
+    return unwrap_return_value(evaluated)
+
+
+def argument_keys(args: List[object.Object]) -> Union[Tuple[object.HashKey, ...], None]:
+    """Return the hash keys of `args`, or None if one of them is not hashable."""
+    keys: List[object.HashKey] = []
+    for arg in args:
+        if not issubclass(arg.__class__, object.Hashable):
+            return None
+        keys.append(arg.hash_key())
+    return tuple(keys)
+
+
+def apply_memoized_function(fn: object.MemoizedFunction, args: List[object.Object]) -> object.Object:
+    key = argument_keys(args)
+    if key is None:
+        return apply_function(fn.fn, args)
+
+    result = fn.cache.get(key)
+    if result is None:
+        result = apply_function(fn.fn, args)
+        if result is not None and not is_error(result):
+            fn.cache.put(key, result)
+    return result
+
+
+def apply_pure_function(fn: object.Function, args: List[object.Object]) -> object.Object:
+    """Call fn through pure_cache.
+
+    The values of the free variables of fn are part of the key. Bindings fn
+    only reaches through the functions it calls are not, so the whole cache
+    is dropped whenever a binding is replaced or shadowed, and a result
+    computed while that happened is not cached.
+    """
+    keys = argument_keys(args)
+    if keys is None or fn.literal is None:
+        return call_function(fn, args)
+
+    bindings = (object.Environment.version, object.Environment.rebinds)
+    if pure_cache.bindings != bindings:
+        pure_cache.clear()
+        pure_cache.bindings = bindings
+
+    deps: List[object.Object] = []
+    for name in ast.free_variables(fn.literal):
+        val, ok = fn.env.get(name)
+        if ok:
+            deps.append(val)
+
+    key = (fn, tuple(deps), keys)
+    result = pure_cache.get(key)
+    if result is not None:
+        return result
+
+    side_effects = pure_cache.side_effects
+    result = call_function(fn, args)
+    if pure_cache.side_effects != side_effects:
+        fn.pure = False
+    elif result is not None and not is_error(result) and \
+            (object.Environment.version, object.Environment.rebinds) == bindings:
+        pure_cache.put(key, result)
+    return result
+
+
 def extend_function_env(fn: object.Function, args: List[object.Object]) -> object.Environment:
-    env = object.new_enclosed_environment(fn.env)
+    env = frames.acquire(fn.env)
+    env.lets = ast.let_names(fn.body)
+    store = env.store
 
+    # Parameters are bound directly: every call of fn binds the same names,
+    # so they cannot invalidate cached lookup depths (see Environment.lookup).
     for param_idx, param in enumerate(fn.parameters):
-        env.set(param.value, args[param_idx])
+        store[param.value] = args[param_idx]
 
     return env
 
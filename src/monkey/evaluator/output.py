@@ -0,0 +1,59 @@
+import contextlib
+import io
+import sys
+from typing import Iterator, List, TextIO
+
+
+class OutputSink:
+    """A buffer in front of the stream Monkey scripts print to.
+
+    Text written by puts is collected and written to the stream in one call
+    once `buffer_size` chars have accumulated, and whenever flush() is
+    called: at the end of every evaluation of a program and before the REPL
+    prompt. Without a `stream`, the sink writes to sys.stdout as it is at
+    the time of the flush.
+    """
+
+    def __init__(self, stream: TextIO = None, buffer_size: int = 1 << 16):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.pending: List[str] = []
+        self.size = 0
+
+    def write(self, text: str):
+        self.pending.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        text = ''.join(self.pending)
+        self.pending = []
+        self.size = 0
+
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(text)
+        stream.flush()
+
+    def redirect(self, stream: TextIO) -> TextIO:
+        """Send the output to `stream` from now on, None for sys.stdout, and
+        return the stream it went to before."""
+        self.flush()
+        previous, self.stream = self.stream, stream
+        return previous
+
+    @contextlib.contextmanager
+    def capture(self) -> Iterator[io.StringIO]:
+        """Collect the output of the with block in a StringIO."""
+        buffer = io.StringIO()
+        previous = self.redirect(buffer)
+        try:
+            yield buffer
+        finally:
+            self.redirect(previous)
+
+
+# The output of puts
+output = OutputSink()
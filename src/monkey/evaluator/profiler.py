@@ -0,0 +1,239 @@
+import bisect
+import json
+import time
+from typing import Any, Callable, Dict, List, TextIO, Tuple
+
+from monkey import ast, object
+from .builtins import builtins
+
+Stack = Tuple[str, ...]
+
+
+def line_starts(source: str) -> List[int]:
+    if source is None:
+        return None
+    return [0] + [i + 1 for i, c in enumerate(source) if c == '\n']
+
+
+def position(line_starts: List[int], offset: int) -> str:
+    """Return `line:column` of `offset`, or `@offset` without the source."""
+    if line_starts is None:
+        return '@{}'.format(offset)
+    line = bisect.bisect_right(line_starts, offset)
+    return '{}:{}'.format(line, offset - line_starts[line - 1] + 1)
+
+
+class FunctionStats:
+
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0  # time inside the function, counting recursive calls once
+        self.self_time = 0.0  # time inside the function but not in functions it called
+
+
+class Profiler:
+    """Measures time spent in Monkey functions along the Monkey call stack.
+
+    Install it with evaluator.use_profiler. Every function call is timed, and
+    the time a call spends outside the calls it makes is added to its whole
+    call stack, which write_collapsed writes in the collapsed stack format
+    of flamegraph tools. Functions are named after the `let` they were
+    bound by, and labelled with their source position: line:column if the
+    profiler was given the `source`, else the offset.
+    """
+
+    def __init__(self, source: str = None, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.line_starts = line_starts(source)
+
+        self.builtin_names: Dict[int, str] = {id(b): name for name, b in builtins.items()}
+
+        self.stacks: Dict[Stack, float] = {}
+        self.functions: Dict[str, FunctionStats] = {}
+
+        # The active calls: their stack, start time and the time spent in
+        # the calls they made
+        self.stack: Stack = ('<program>',)
+        self.frames: List[Tuple[Stack, float, float]] = [(self.stack, clock(), 0.0)]
+        self.active: Dict[str, int] = {}
+
+    def label(self, fn: object.Object) -> str:
+        if fn.__class__ is object.Builtin:
+            return self.builtin_names.get(id(fn), '<builtin>')
+
+        literal = fn.literal
+        if literal is None:
+            return '<anonymous>'
+
+        return '{} ({})'.format(literal.name or '<anonymous>', position(self.line_starts, literal.token.start))
+
+    def call(self, fn: object.Object, args: List[object.Object],
+             apply: Callable[[object.Object, List[object.Object]], object.Object]) -> object.Object:
+        """Call apply(fn, args) and account its time to fn."""
+        label = self.label(fn)
+        stats = self.functions.get(label)
+        if stats is None:
+            stats = self.functions[label] = FunctionStats()
+        stats.calls += 1
+
+        stack = self.stack = self.stack + (label,)
+        self.frames.append((stack, self.clock(), 0.0))
+        self.active[label] = self.active.get(label, 0) + 1
+        try:
+            return apply(fn, args)
+        finally:
+            self.leave(label, stats)
+
+    def leave(self, label: str, stats: FunctionStats):
+        stack, start, children = self.frames.pop()
+        elapsed = self.clock() - start
+        own = elapsed - children
+
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + own
+        stats.self_time += own
+        self.active[label] -= 1
+        if self.active[label] == 0:
+            stats.total_time += elapsed
+
+        parent_stack, parent_start, parent_children = self.frames[-1]
+        self.frames[-1] = (parent_stack, parent_start, parent_children + elapsed)
+        self.stack = parent_stack
+
+    def finish(self):
+        """Account the time spent outside of any function to <program>."""
+        stack, start, children = self.frames[0]
+        now = self.clock()
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + (now - start - children)
+        self.frames[0] = (stack, now, 0.0)
+
+    def write_collapsed(self, out: TextIO):
+        """Write one `frame;frame;frame microseconds` line per call stack."""
+        for stack, seconds in sorted(self.stacks.items()):
+            micros = int(seconds * 1000000)
+            if micros > 0:
+                out.write('{} {}\n'.format(';'.join(stack), micros))
+
+    def report(self, limit: int = 20) -> str:
+        """Return a table of the functions taking the most time themselves."""
+        rows = sorted(self.functions.items(), key=lambda item: item[1].self_time, reverse=True)
+        lines = ['{:>10} {:>12} {:>12}  {}'.format('calls', 'total (s)', 'self (s)', 'function')]
+        for label, stats in rows[:limit]:
+            lines.append('{:>10} {:>12.6f} {:>12.6f}  {}'.format(stats.calls, stats.total_time, stats.self_time, label))
+        return '\n'.join(lines)
+
+
+class NodeStats:
+
+    def __init__(self, node: ast.Node):
+        self.node = node
+        self.count = 0
+        self.total_time = 0.0  # time evaluating the node, counting recursive evaluations once
+        self.self_time = 0.0  # time evaluating the node but not its children
+        self.active = 0
+
+
+class NodeCounters:
+    """Counts evaluations and time per AST node.
+
+    Install it with evaluator.use_node_counters. Nodes are keyed by their
+    kind and the source offset of their token, so the counts of two runs of
+    the same script, or of two versions of it, can be compared with
+    write_json.
+    """
+
+    def __init__(self, source: str = None, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.line_starts = line_starts(source)
+        self.nodes: Dict[Tuple[int, str], NodeStats] = {}
+
+        # The node the evaluator is about to evaluate, see count
+        self.current: ast.Node = None
+        self.children: List[float] = [0.0]
+
+    def count(self, node: ast.Node, env: object.Environment,
+              eval: Callable[[ast.Node, object.Environment], object.Object]) -> object.Object:
+        """Evaluate `node` with eval and account the evaluation to it."""
+        self.current = node
+        if node.__class__ is ast.Program:
+            return eval(node, env)
+
+        key = (node.token.start, node.__class__.__name__)
+        stats = self.nodes.get(key)
+        if stats is None:
+            stats = self.nodes[key] = NodeStats(node)
+        stats.count += 1
+        stats.active += 1
+
+        self.children.append(0.0)
+        start = self.clock()
+        try:
+            return eval(node, env)
+        finally:
+            elapsed = self.clock() - start
+            stats.self_time += elapsed - self.children.pop()
+            self.children[-1] += elapsed
+            stats.active -= 1
+            if stats.active == 0:
+                stats.total_time += elapsed
+
+    def hot(self, kinds: Tuple[type, ...], limit: int) -> List[NodeStats]:
+        nodes = [stats for stats in self.nodes.values() if issubclass(stats.node.__class__, kinds)]
+        return sorted(nodes, key=lambda stats: stats.self_time, reverse=True)[:limit]
+
+    def branches(self, node: ast.IfExpression) -> Tuple[int, int]:
+        """Return how often the consequence and the alternative of `node` ran."""
+        taken = []
+        for block in (node.consequence, node.alternative):
+            stats = None
+            if block is not None:
+                stats = self.nodes.get((block.token.start, block.__class__.__name__))
+            taken.append(stats.count if stats is not None else 0)
+        return taken[0], taken[1]
+
+    def report(self, limit: int = 10) -> str:
+        """Return tables of the hottest expressions, call sites and if expressions."""
+        lines = []
+        sections = [
+            ('expressions', (ast.Expression,)),
+            ('call sites', (ast.CallExpression,)),
+            ('if expressions', (ast.IfExpression,)),
+        ]
+        for title, kinds in sections:
+            if lines:
+                lines.append('')
+            lines.append('hottest {}:'.format(title))
+            lines.append('{:>10} {:>12} {:>12}  {:<10} {}'.format('count', 'total (s)', 'self (s)', 'position', 'node'))
+            for stats in self.hot(kinds, limit):
+                description = stats.node.__class__.__name__
+                if stats.node.__class__ is ast.IfExpression:
+                    description += ' (then {}, else {})'.format(*self.branches(stats.node))
+                else:
+                    description += ' ' + excerpt(stats.node)
+                lines.append('{:>10} {:>12.6f} {:>12.6f}  {:<10} {}'.format(
+                    stats.count, stats.total_time, stats.self_time,
+                    position(self.line_starts, stats.node.token.start), description))
+        return '\n'.join(lines)
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        nodes = []
+        for (offset, kind), stats in sorted(self.nodes.items()):
+            nodes.append({
+                'kind': kind,
+                'offset': offset,
+                'position': position(self.line_starts, offset),
+                'count': stats.count,
+                'total_time': stats.total_time,
+                'self_time': stats.self_time,
+            })
+        return nodes
+
+    def write_json(self, out: TextIO):
+        json.dump({'nodes': self.to_json()}, out, indent=2)
+        out.write('\n')
+
+
+def excerpt(node: ast.Node, width: int = 40) -> str:
+    text = ' '.join(node.string().split())
+    if len(text) > width:
+        text = text[:width - 3] + '...'
+    return text
@@ -0,0 +1 @@
+from .interpreter import *
@@ -0,0 +1,194 @@
+import threading
+from typing import Any, Callable, Dict, List, TextIO
+
+from monkey import ast, evaluator, lexer, object, parser
+
+
+# The evaluator keeps its state in module globals: the frame pool, the
+# active budget, the output sink, the pure function cache and the profiler.
+# Every interpreter evaluates under this lock, so that runs never see each
+# other's state.
+_lock = threading.RLock()
+
+
+class CompileError(ValueError):
+    """Raised by Interpreter.compile for source with syntax errors."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+class MonkeyError(RuntimeError):
+    """Raised by Interpreter.run for scripts which evaluate to an error."""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class Program:
+    """A parsed script, which can be run any number of times."""
+
+    def __init__(self, source: str, program: ast.Program):
+        self.source = source
+        self.program = program
+
+    def __repr__(self) -> str:
+        return 'Program({!r})'.format(self.source if len(self.source) <= 40 else self.source[:37] + '...')
+
+
+class Interpreter:
+    """Runs Monkey scripts embedded in a Python application.
+
+        interpreter = Interpreter()
+        program = interpreter.compile('fn(x) { x * factor }(n)')
+        interpreter.run(program, {'n': 2, 'factor': 21})  # 42
+
+    compile caches the last `cache_size` programs by source, so compiling
+    the same source again does not parse it again. run evaluates a program
+    in a fresh environment holding `globals`, converted with to_monkey, and
+    converts the result with to_python. A `budget` limits every run, see
+    evaluator.Budget.
+
+    A `prelude`, e.g. a library of helper functions, is evaluated once. Each
+    run then starts from a fork of its environment, which sees the bindings
+    of the prelude without copying them, and cannot change them.
+
+    The output of puts goes to `output` if given, e.g. an io.StringIO, and
+    to sys.stdout otherwise.
+
+    All interpreters share the evaluator's global state, so their runs are
+    serialized on a lock: interpreters may be used from several threads, but
+    only one thread runs Monkey code at a time. Run scripts in parallel with
+    monkey.batch or monkey.server, which use worker processes.
+    """
+
+    def __init__(self, cache_size: int = 256, budget: evaluator.Budget = None, prelude: str = None,
+                 output: TextIO = None):
+        self.programs = object.LRUCache(cache_size)
+        self.budget = budget
+        self.output = output
+
+        self.prelude: object.Environment = None
+        if prelude is not None:
+            env = object.Environment()
+            evaluated = self.eval(self.compile(prelude).program, env)
+            if issubclass(evaluated.__class__, object.Error):
+                raise MonkeyError(evaluated.message)
+            self.prelude = env.freeze()
+
+    def compile(self, source: str) -> Program:
+        key = parser.source_hash(source)
+        with _lock:
+            program = self.programs.get(key)
+        if program is not None:
+            return program
+
+        p = parser.Parser(lexer.Lexer(source))
+        parsed = p.parse_program()
+        if len(p.errors) != 0:
+            raise CompileError(p.errors)
+
+        program = Program(source, parsed)
+        with _lock:
+            self.programs.put(key, program)
+        return program
+
+    def run(self, program: Program, globals: Dict[str, Any] = None) -> Any:
+        if isinstance(program, str):
+            program = self.compile(program)
+
+        env = self.prelude.fork() if self.prelude is not None else object.Environment()
+        for name, value in (globals or {}).items():
+            env.set(name, to_monkey(value))
+
+        evaluated = self.eval(program.program, env)
+        if issubclass(evaluated.__class__, object.Error):
+            raise MonkeyError(evaluated.message)
+        return to_python(evaluated)
+
+    def eval(self, program: ast.Program, env: object.Environment) -> object.Object:
+        with _lock:
+            if self.output is None:
+                return evaluator.eval(program, env, self.budget)
+
+            previous = evaluator.output.redirect(self.output)
+            try:
+                return evaluator.eval(program, env, self.budget)
+            finally:
+                evaluator.output.redirect(previous)
+
+
+def to_monkey(value: Any) -> object.Object:
+    """Convert a Python value to a Monkey object.
+
+    None, booleans, ints, strings, lists, tuples and dicts convert to their
+    Monkey counterparts, recursively. Python callables become builtins,
+    which convert their arguments with to_python and their result with
+    to_monkey. Monkey objects are returned as they are.
+    """
+    if value is None:
+        return evaluator.NULL
+    elif value is True:
+        return evaluator.TRUE
+    elif value is False:
+        return evaluator.FALSE
+    elif isinstance(value, int):
+        return object.Integer(value)
+    elif isinstance(value, str):
+        return object.String(value)
+    elif isinstance(value, (list, tuple)):
+        return object.Array([to_monkey(v) for v in value])
+    elif isinstance(value, dict):
+        pairs = {}
+        for k, v in value.items():
+            key = to_monkey(k)
+            if not isinstance(key, object.Hashable):
+                raise TypeError('unusable as hash key: {}'.format(key.type()))
+            pairs[key.hash_key()] = object.HashPair(key, to_monkey(v))
+        return object.Hash(pairs)
+    elif isinstance(value, object.Object):
+        return value
+    elif callable(value):
+        return object.Builtin(_host_function(value), pure=False)
+    raise TypeError('cannot convert {} to a Monkey object'.format(type(value).__name__))
+
+
+def to_python(obj: object.Object) -> Any:
+    """Convert a Monkey object to a Python value, the inverse of to_monkey.
+
+    Monkey functions become Python callables, which raise MonkeyError if
+    the function evaluates to an error.
+    """
+    cls = obj.__class__
+    if obj is None or cls is object.Null:
+        return None
+    elif cls is object.Integer or cls is object.Boolean or cls is object.String:
+        return obj.value
+    elif cls is object.Array:
+        return [to_python(element) for element in obj.elements]
+    elif cls is object.Hash or cls is object.LazyHash:
+        return {to_python(pair.key): to_python(pair.value) for pair in obj.pairs.values()}
+    elif cls is object.Function or cls is object.MemoizedFunction or cls is object.Builtin:
+        return _monkey_function(obj)
+    return obj
+
+
+def _host_function(fn: Callable) -> object.BuiltinFunction:
+    def call(*args: object.Object) -> object.Object:
+        try:
+            return to_monkey(fn(*[to_python(arg) for arg in args]))
+        except Exception as e:
+            return evaluator.new_error('{}: {}', e.__class__.__name__, e)
+    return call
+
+
+def _monkey_function(fn: object.Object) -> Callable:
+    def call(*args: Any) -> Any:
+        with _lock:
+            result = evaluator.apply_function(fn, [to_monkey(arg) for arg in args])
+        if issubclass(result.__class__, object.Error):
+            raise MonkeyError(result.message)
+        return to_python(result)
+    return call
@@ -1,12 +1,14 @@
+from typing import List
+
 from .. import token
 
 
 class Lexer:
 
-    def __init__(self, input: str):
+    def __init__(self, input: str, start: int = 0):
         self.input: str = input
-        self.position: int = 0      # current position in input (points to current char)
-        self.read_position: int = 0  # current reading position in input (after current char)
+        self.position: int = start      # current position in input (points to current char)
+        self.read_position: int = start  # current reading position in input (after current char)
         self.ch: str = ''           # current char under examination
 
         self.read_char()
@@ -15,6 +17,7 @@ class Lexer:
         tok = Lexer.new_token(token.ILLEGAL, self.ch)
 
         self.skip_whitespace()
+        start = self.position
 
         if self.ch == '=':
             if self.peek_char() == '=':
@@ -73,16 +76,21 @@ class Lexer:
             if Lexer.is_letter(self.ch):
                 tok.literal = self.read_identifier()
                 tok.type = token.lookup_ident(tok.literal)
-                return tok
+                return self.locate(tok, start)
             elif Lexer.is_digit(self.ch):
                 tok.type = token.INT
                 tok.literal = self.read_number()
-                return tok
+                return self.locate(tok, start)
             else:
                 tok = Lexer.new_token(token.ILLEGAL, self.ch)
 
         self.read_char()
 
+        return self.locate(tok, start)
+
+    def locate(self, tok: token.Token, start: int) -> token.Token:
+        tok.start = min(start, len(self.input))
+        tok.end = min(self.position, len(self.input))
         return tok
 
     def skip_whitespace(self):
@@ -134,3 +142,42 @@ class Lexer:
     @classmethod
     def new_token(cls, token_type: token.TokenType, ch: str) -> token.Token:
         return token.Token(token_type, ch)
+
+
+def tokenize(input: str) -> List[token.Token]:
+    """Lex the whole input, returning every token up to and including EOF."""
+    l = Lexer(input)
+    tokens: List[token.Token] = []
+
+    while True:
+        tok = l.next_token()
+        tokens.append(tok)
+        if tok.type == token.EOF:
+            return tokens
+
+
+class TokenStream:
+    """Replays a list of already lexed tokens through the Lexer interface.
+
+    The parser only ever calls next_token(), so a TokenStream can stand in
+    for a Lexer when the tokens are known up front. Once the list is
+    exhausted the stream keeps returning an EOF token.
+    """
+
+    def __init__(self, tokens: List[token.Token], position: int = 0):
+        self.tokens = tokens
+        self.position = position  # index of the token next_token() returns
+
+        if len(tokens) > 0 and tokens[-1].type == token.EOF:
+            self.eof = tokens[-1]
+        else:
+            end = tokens[-1].end if len(tokens) > 0 else 0
+            self.eof = token.Token(token.EOF, '', end, end)
+
+    def next_token(self) -> token.Token:
+        if self.position >= len(self.tokens):
+            self.position += 1
+            return self.eof
+        tok = self.tokens[self.position]
+        self.position += 1
+        return tok
@@ -1,10 +1,172 @@
+import argparse
 import getpass
+import json
+import sys
+import time
 
-from monkey import repl
+from monkey import batch, evaluator, object, parser, repl, server
 
+# Exit statuses of `pymonkey run`
+EXIT_OK = 0
+EXIT_ERROR = 1  # the script evaluated to an error
+EXIT_PARSE_ERROR = 2  # the script could not be read or parsed
 
-def main():
-    user = getpass.getuser()
-    print('Hello {}! This is the Monkey programming language!'.format(user))
-    print('Feel free to type in commands')
-    repl.start()
+
+def main(argv=None) -> int:
+    args = argument_parser().parse_args(argv)
+
+    if args.command == 'run':
+        return run(args)
+    if args.command == 'batch':
+        return run_batch(args)
+    if args.command == 'serve':
+        server.serve(host=args.host, port=args.port, max_workers=args.workers, timeout=args.timeout,
+                     max_concurrency=args.max_concurrency, max_queued=args.max_queued,
+                     scripts_dir=args.scripts)
+        return EXIT_OK
+
+    with Instrumentation(args):
+        try:
+            user = getpass.getuser()
+            print('Hello {}! This is the Monkey programming language!'.format(user))
+            print('Feel free to type in commands')
+            repl.start()
+        except (EOFError, KeyboardInterrupt):
+            print()
+    return EXIT_OK
+
+
+def argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='pymonkey', description='The Monkey programming language')
+    add_instrumentation_arguments(parser)
+
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    run = commands.add_parser('run', help='run a script',
+                              description='Run a Monkey script. Exits with 1 if the script evaluates '
+                                          'to an error, and with 2 if it cannot be read or parsed.')
+    run.add_argument('script', help='path of the script')
+    run.add_argument('--no-cache', dest='cache', action='store_false',
+                     help='neither read nor write the .monkeyc cache of the script')
+    run.add_argument('--timings', action='store_true',
+                     help='print the time spent reading, parsing and evaluating the script')
+    add_instrumentation_arguments(run)
+
+    batch = commands.add_parser('batch', help='run many scripts in parallel',
+                                description='Run independent Monkey scripts across a pool of worker '
+                                            'processes, printing each result as its script finishes. '
+                                            'Exits with 1 if any script failed.')
+    batch.add_argument('scripts', nargs='*', help='paths of the scripts')
+    batch.add_argument('--list', metavar='FILE', type=argparse.FileType('r'),
+                       help='also run the scripts whose paths are listed in FILE, one per line, - for stdin')
+    batch.add_argument('-j', '--workers', type=int, help='number of worker processes, one per CPU by default')
+    batch.add_argument('--timeout', type=float, help='limit the evaluation time of each script, in seconds')
+    batch.add_argument('--no-cache', dest='cache', action='store_false',
+                       help='neither read nor write the .monkeyc caches of the scripts')
+    batch.add_argument('--json', action='store_true', help='print one JSON object per script')
+
+    serve = commands.add_parser('serve', help='evaluate scripts sent over HTTP',
+                                description='Serve POST /eval on localhost, evaluating the Monkey '
+                                            'source or script id in the JSON body on a pool of workers.')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('-j', '--workers', type=int, help='number of worker processes, one per CPU by default')
+    serve.add_argument('--timeout', type=float, default=10.0, help='time limit of each script, in seconds')
+    serve.add_argument('--max-concurrency', type=int, help='scripts evaluated at a time, one per worker by default')
+    serve.add_argument('--max-queued', type=int, default=100, help='requests waiting for a worker before refusing more')
+    serve.add_argument('--scripts', metavar='DIR', help='directory of the scripts which can be run by id')
+    return parser
+
+
+def add_instrumentation_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--profile', metavar='PATH', default=argparse.SUPPRESS,
+                        help='profile function calls and write collapsed stacks to PATH')
+    parser.add_argument('--hotspots', metavar='PATH', default=argparse.SUPPRESS,
+                        help='count evaluations per AST node and write them to PATH as JSON')
+
+
+def run(args: argparse.Namespace) -> int:
+    timings = {} if args.timings else None
+    try:
+        program, errors = parser.parse_file(args.script, args.cache, timings)
+    except (OSError, UnicodeDecodeError) as e:
+        print('pymonkey: cannot read {}: {}'.format(args.script, e), file=sys.stderr)
+        return EXIT_PARSE_ERROR
+
+    if len(errors) != 0:
+        for msg in errors:
+            print('{}: {}'.format(args.script, msg), file=sys.stderr)
+        return EXIT_PARSE_ERROR
+
+    with Instrumentation(args, args.script):
+        start = time.perf_counter()
+        result = evaluator.eval(program, object.Environment())
+        if timings is not None:
+            timings['eval'] = time.perf_counter() - start
+
+    if timings is not None:
+        for phase, seconds in timings.items():
+            print('{:<6} {:.6f}s'.format(phase, seconds), file=sys.stderr)
+
+    if issubclass(result.__class__, object.Error):
+        print(result.inspect(), file=sys.stderr)
+        return EXIT_ERROR
+    return EXIT_OK
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    scripts = list(args.scripts)
+    if args.list is not None:
+        scripts.extend(line.strip() for line in args.list if line.strip())
+
+    status = EXIT_OK
+    for result in batch.run_batch(scripts, args.workers, use_cache=args.cache, timeout=args.timeout):
+        if not result.ok:
+            status = EXIT_ERROR
+
+        if args.json:
+            print(json.dumps({'script': result.name, 'ok': result.ok, 'result': result.result,
+                              'output': result.output, 'error': result.error, 'timings': result.timings}))
+        else:
+            seconds = sum(result.timings.values())
+            outcome = result.result if result.ok else 'ERROR: ' + result.error
+            print('{}\t{:.6f}s\t{}'.format(result.name, seconds, outcome))
+        sys.stdout.flush()
+    return status
+
+
+class Instrumentation:
+    """Installs the profiler and node counters requested on the command line
+    for the duration of a with block, and writes their results after it."""
+
+    def __init__(self, args: argparse.Namespace, script: str = None):
+        self.profile = getattr(args, 'profile', None)
+        self.hotspots = getattr(args, 'hotspots', None)
+        self.source = None
+        if script is not None and (self.profile is not None or self.hotspots is not None):
+            with open(script, encoding='utf-8') as f:
+                self.source = f.read()
+
+        self.profiler = None
+        self.counters = None
+
+    def __enter__(self):
+        if self.profile is not None:
+            self.profiler = evaluator.Profiler(self.source)
+            evaluator.use_profiler(self.profiler)
+        if self.hotspots is not None:
+            self.counters = evaluator.NodeCounters(self.source)
+            evaluator.use_node_counters(self.counters)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            evaluator.use_profiler(None)
+            self.profiler.finish()
+            with open(self.profile, 'w') as f:
+                self.profiler.write_collapsed(f)
+            print(self.profiler.report(), file=sys.stderr)
+        if self.counters is not None:
+            evaluator.use_node_counters(None)
+            with open(self.hotspots, 'w') as f:
+                self.counters.write_json(f)
+            print(self.counters.report(), file=sys.stderr)
@@ -1,2 +1,3 @@
 from .environment import *
 from .object import *
+from .memo import *
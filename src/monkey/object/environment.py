@@ -1,10 +1,38 @@
-from typing import Dict, Tuple, Union
+import weakref
+from typing import Dict, FrozenSet, List, Tuple, Union
 
 from .object import Object
 
+_MISSING = object()
+
 
 class Environment:
 
+    # Incremented whenever a new binding shadows a name of an outer
+    # environment, which invalidates the depths cached by lookup().
+    version = 0
+
+    # Incremented whenever a `let` replaces an existing binding, which may
+    # change the result of any function reading it, see
+    # evaluator.apply_pure_function.
+    rebinds = 0
+
+    # Set once a closure keeps this environment, after which it must never
+    # be recycled by an EnvironmentPool.
+    captured = False
+
+    # Names the function owning this environment binds with `let`, which a
+    # closure must not copy as they may still be bound or rebound later.
+    lets: FrozenSet[str] = frozenset()
+
+    # Set by freeze(), after which the environment can only be read, and
+    # shared by any number of forks.
+    frozen = False
+
+    # Set on the environments returned by fork(), which are the global
+    # environments of the scripts run in them.
+    forked = False
+
     def __init__(self, store: Dict[str, Object] = None, outer=None):
         if store is None:
             store = {}
@@ -12,16 +40,117 @@ class Environment:
         self.outer = outer
 
     def get(self, name: str) -> Union[Tuple[Object, bool], Tuple[None, bool]]:
-        if name in self.store:
-            return self.store[name], True
-        elif self.outer is not None and name in self.outer.store:
-            return self.outer.get(name)
+        env = self
+        while env is not None:
+            val = env.store.get(name, _MISSING)
+            if val is not _MISSING:
+                return val, True
+            env = env.outer
+        return None, False
+
+    def lookup(self, site) -> Union[Tuple[Object, bool], Tuple[None, bool]]:
+        """Like get(site.value), for the ast.Identifier `site`.
+
+        When a name is found in an outer environment, the depth and a weak
+        reference to this environment's outer are cached on the site. The
+        next lookup from the site with the same outer environment probes
+        this environment and then goes straight to the cached depth. The
+        environments in between are the same objects as before, and could
+        only have gained the name by a binding which shadows it, which bumps
+        Environment.version and invalidates every cached depth.
+        """
+        name = site.value
+        val = self.store.get(name, _MISSING)
+        if val is not _MISSING:
+            return val, True
+
+        outer = self.outer
+        if outer is None:
+            return None, False
+
+        if site.cache_version == Environment.version and site.cache_outer is not None \
+                and site.cache_outer() is outer:
+            env = outer
+            for _ in range(site.cache_depth - 1):
+                env = env.outer
+            val = env.store.get(name, _MISSING)
+            if val is not _MISSING:
+                return val, True
+
+        env = outer
+        depth = 1
+        while env is not None:
+            val = env.store.get(name, _MISSING)
+            if val is not _MISSING:
+                site.cache_version = Environment.version
+                site.cache_depth = depth
+                site.cache_outer = weakref.ref(outer)
+                return val, True
+            env = env.outer
+            depth += 1
         return None, False
 
     def set(self, name: str, val: Object) -> Object:
-        self.store[name] = val
+        if self.frozen:
+            raise ValueError('cannot bind {} in a frozen environment'.format(name))
+        store = self.store
+        if name in store:
+            Environment.rebinds += 1
+        elif self.outer is not None and self.outer.get(name)[1]:
+            Environment.version += 1
+        store[name] = val
         return val
 
+    def freeze(self) -> 'Environment':
+        """Make the environment read-only, as a snapshot to fork from."""
+        self.frozen = True
+        return self
+
+    def fork(self) -> 'Environment':
+        """Return a new global environment layered over this one, freezing it.
+
+        The fork starts out with all the bindings of this environment without
+        copying them. Its own bindings go to its private store, where they
+        shadow, but never change, the bindings of this environment, so forks
+        of the same snapshot are isolated from each other. Functions bound in
+        the snapshot keep looking up globals in the snapshot.
+        """
+        self.frozen = True
+        env = Environment({}, self)
+        env.forked = True
+        return env
+
+
+class EnvironmentPool:
+    """A free list of function call environments.
+
+    apply_function acquires the environment of each call from the pool and
+    releases it when the call returns. Unless a closure captured it, nothing
+    refers to the environment any more, so its dict is cleared and kept for
+    a later call instead of allocating a new one.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.free: List[Environment] = []
+        self.max_size = max_size
+        self.allocations = 0  # environments created by acquire()
+        self.reuses = 0  # environments acquire() took from the free list
+
+    def acquire(self, outer: Environment) -> Environment:
+        if self.free:
+            env = self.free.pop()
+            env.outer = outer
+            self.reuses += 1
+            return env
+        self.allocations += 1
+        return Environment({}, outer)
+
+    def release(self, env: Environment):
+        if not env.captured and len(self.free) < self.max_size:
+            env.store.clear()
+            env.outer = None
+            self.free.append(env)
+
 
 def new_enclosed_environment(outer: Environment) -> Environment:
     env = new_environment()
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from typing import Any, Dict, Tuple, Union
+
+from .object import Object, ObjectType
+
+
+class LRUCache:
+    """A bounded mapping which evicts the least recently used entry, counting
+    hits, misses and evictions."""
+
+    def __init__(self, max_size: int = 1024):
+        self.entries: 'OrderedDict[Any, Object]' = OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Any) -> Union[Object, None]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Any, value: Object):
+        entries = self.entries
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.entries),
+        }
+
+
+class PureFunctionCache(LRUCache):
+    """The result cache of the evaluator's automatic memoization mode.
+
+    `side_effects` counts the calls of impure builtins. A call during which
+    it changes had side effects, so its result is not cached and its
+    function is no longer considered pure.
+
+    `bindings` is the (Environment.version, Environment.rebinds) pair the
+    entries were computed under. Once a binding is replaced or shadowed
+    anywhere, the evaluator clears the cache, since a cached function might
+    reach the binding through the functions it calls.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        super().__init__(max_size)
+        self.side_effects = 0
+        self.bindings: Tuple[int, int] = (0, 0)
+
+
+class MemoizedFunction(Object):
+    """A function wrapped by the `memoize` builtin.
+
+    Calls whose arguments are all hashable are answered from `cache`, keyed
+    on the hash keys of the arguments. `fn` is a Function or a Builtin.
+    """
+
+    def __init__(self, fn: Object, max_size: int = 1024):
+        self.fn = fn
+        self.cache = LRUCache(max_size)
+
+    def type(self) -> ObjectType:
+        return self.fn.type()
+
+    def inspect(self) -> str:
+        return self.fn.inspect()
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, List, NewType
+from typing import Any, Callable, Dict, Iterator, List, NewType, Union
 
 from monkey import ast
 
@@ -19,6 +19,7 @@ BUILTIN_OBJ = 'BUILTIN'
 
 ARRAY_OBJ = 'ARRAY'
 HASH_OBJ = 'HASH'
+SEQUENCE_OBJ = 'SEQUENCE'
 
 
 class HashKey:
@@ -125,29 +126,31 @@ class Error(Object):
 
 class Function(Object):
 
-    def __init__(self, parameters: List[ast.Identifier], body: ast.BlockStatement, env):
+    # Cleared once a call of the function had side effects, see
+    # PureFunctionCache
+    pure = True
+
+    def __init__(self, parameters: List[ast.Identifier], body: ast.BlockStatement, env,
+                 literal: ast.FunctionLiteral = None):
         self.parameters = parameters
         self.body = body
         self.env = env
+        self.literal = literal  # the function literal the function was created from
 
     def type(self) -> ObjectType:
         return FUNCTION_OBJ
 
     def inspect(self) -> str:
-        out = ''
+        out: List[str] = []
 
-        params: List[str] = []
-        for p in self.parameters:
-            params.append(p.string())
+        out.append('fn')
+        out.append('(')
+        ast.render_list(out.append, self.parameters)
+        out.append(') {\n')
+        self.body.render(out.append)
+        out.append('\n}')
 
-        out += 'fn'
-        out += '('
-        out += ', '.join(params)
-        out += ') {\n'
-        out += self.body.string()
-        out += '\n}'
-
-        return out
+        return ''.join(out)
 
 
 class String(Object, Hashable):
@@ -167,8 +170,9 @@ class String(Object, Hashable):
 
 class Builtin(Object):
 
-    def __init__(self, fn: BuiltinFunction):
+    def __init__(self, fn: BuiltinFunction, pure: bool = True):
         self.fn = fn
+        self.pure = pure  # False for builtins with side effects, like puts
 
     def type(self):
         return BUILTIN_OBJ
@@ -199,6 +203,45 @@ class Array(Object):
         return out
 
 
+class Sequence(Object):
+    """A lazy list, such as the lines of a file.
+
+    A sequence is a cell holding the first element and the sequence of the
+    rest, both taken from `elements` when first asked for. Cells nothing
+    refers to any more are freed, so walking a sequence with first and rest
+    holds only the current cell in memory.
+    """
+
+    def __init__(self, elements: Iterator[Object]):
+        self.elements = elements
+        self.head: Object = None
+        self.tail: 'Sequence' = None
+
+    def force(self):
+        if self.elements is not None:
+            self.head = next(self.elements, None)
+            if self.head is not None:
+                self.tail = Sequence(self.elements)
+            self.elements = None
+
+    def first(self) -> Union[Object, None]:
+        """Return the first element, or None if the sequence is empty."""
+        self.force()
+        return self.head
+
+    def rest(self) -> Union['Sequence', None]:
+        """Return the sequence after the first element, or None if the
+        sequence is empty."""
+        self.force()
+        return self.tail
+
+    def type(self):
+        return SEQUENCE_OBJ
+
+    def inspect(self):
+        return 'sequence'
+
+
 class HashPair:
 
     def __init__(self, key: Object, value: Object):
@@ -226,3 +269,20 @@ class Hash(Object):
         out += '}'
 
         return out
+
+
+class LazyHash(Hash):
+    """A hash whose pairs are only built from `data` by `build` when first
+    needed, e.g. for a big JSON document of which a script reads a few keys.
+    """
+
+    def __init__(self, data: Any, build: Callable[[Any], Dict[HashKey, HashPair]]):
+        self.data = data
+        self.build = build
+        self._pairs: Dict[HashKey, HashPair] = None
+
+    @property
+    def pairs(self) -> Dict[HashKey, HashPair]:
+        if self._pairs is None:
+            self._pairs = self.build(self.data)
+        return self._pairs
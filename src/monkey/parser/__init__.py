@@ -1 +1,5 @@
 from .parser import *
+from .incremental import *
+from .parallel import *
+from .cache import *
+from .iterative import *
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import time
+from typing import Dict, List, Tuple, Union
+
+from monkey import ast, lexer
+from .parser import Parser
+
+CACHE_SUFFIX = '.monkeyc'
+
+
+def cache_path(path: str) -> str:
+    """Return the path of the compiled cache file of the script at `path`.
+
+    The suffix is appended to the full file name, so that foo.monkey and
+    foo.txt get the separate caches foo.monkey.monkeyc and foo.txt.monkeyc.
+    """
+    return path + CACHE_SUFFIX
+
+
+def source_hash(source: str) -> bytes:
+    return hashlib.sha256(source.encode('utf-8')).digest()
+
+
+def read_cache(path: str, source: str) -> Union[ast.Program, None]:
+    """Load the cached program of the script at `path`.
+
+    Returns None if there is no cache, or if it was written for a different
+    source or by an incompatible version.
+    """
+    try:
+        with open(cache_path(path), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    digest = source_hash(source)
+    if data[:len(digest)] != digest:
+        return None
+
+    try:
+        return ast.loads(data[len(digest):])
+    except ValueError:
+        return None
+
+
+def write_cache(path: str, source: str, program: ast.Program):
+    """Write the cache file of the script at `path`.
+
+    Failing to write the cache is not an error, the script is simply parsed
+    again next time.
+    """
+    target = cache_path(path)
+    tmp = '{}.{}.tmp'.format(target, os.getpid())
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(source_hash(source))
+            ast.dump(program, f)
+        os.replace(tmp, target)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def parse_file(path: str, use_cache: bool = True,
+               timings: Dict[str, float] = None) -> Tuple[ast.Program, List[str]]:
+    """Parse the script at `path`, going through its .monkeyc cache.
+
+    The cache is used whenever its hash matches the current source, and is
+    rewritten after parsing a script without errors. If `timings` is given,
+    the seconds spent reading the script and loading the cache, or lexing
+    and parsing it, are stored in it.
+    """
+    start = time.perf_counter()
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    if timings is not None:
+        timings['read'] = time.perf_counter() - start
+
+    if use_cache:
+        start = time.perf_counter()
+        program = read_cache(path, source)
+        if timings is not None:
+            timings['cache'] = time.perf_counter() - start
+        if program is not None:
+            return program, []
+
+    if timings is None:
+        p = Parser(lexer.Lexer(source))
+        program = p.parse_program()
+    else:
+        start = time.perf_counter()
+        tokens = lexer.tokenize(source)
+        timings['lex'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        p = Parser(lexer.TokenStream(tokens))
+        program = p.parse_program()
+        timings['parse'] = time.perf_counter() - start
+
+    if use_cache and len(p.errors) == 0:
+        write_cache(path, source, program)
+
+    return program, p.errors
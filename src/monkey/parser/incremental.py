@@ -0,0 +1,146 @@
+from bisect import bisect_left
+from typing import Iterator, List, Union
+
+from monkey import ast, lexer, token
+from .parser import Parser
+
+
+class Entry:
+    """A top-level statement together with the tokens it was parsed from.
+
+    The statement covers the token indices [start, end), and end is also the
+    index of the first token of the following statement. The parser looks one
+    token ahead, so the statement depends on the tokens [start, end].
+    """
+
+    def __init__(self, start: int, end: int, statement: Union[ast.Statement, None], errors: List[str]):
+        self.start = start
+        self.end = end
+        self.statement = statement
+        self.errors = errors
+
+
+class IncrementalParser:
+    """Parses a source once and then keeps the tokens and AST up to date as the
+    source is edited.
+
+    An edit only re-lexes the text between the edit and the first token which
+    is unaffected by it, and only re-parses the top-level statements which
+    depend on one of the re-lexed tokens. Every other statement is reused as
+    is, so its ast.Statement object survives the edit unchanged.
+    """
+
+    def __init__(self, input: str):
+        self.input = input
+        self.tokens = lexer.tokenize(input)
+        self.entries: List[Entry] = list(self.parse_from(0))
+
+    @property
+    def program(self) -> ast.Program:
+        return ast.Program([e.statement for e in self.entries if e.statement is not None])
+
+    @property
+    def errors(self) -> List[str]:
+        return [msg for e in self.entries for msg in e.errors]
+
+    def edit(self, offset: int, deleted: int, inserted: str) -> ast.Program:
+        """Replace `deleted` chars at `offset` with `inserted` and update the AST."""
+        if offset < 0 or deleted < 0 or offset + deleted > len(self.input):
+            raise ValueError('edit out of range: offset={}, deleted={}'.format(offset, deleted))
+
+        self.input = self.input[:offset] + inserted + self.input[offset + deleted:]
+        first, last, count = self.relex(offset, deleted, len(inserted))
+        self.reparse(first, last, count)
+
+        return self.program
+
+    def relex(self, offset: int, deleted: int, inserted: int):
+        """Re-lex the damaged region and splice the new tokens into self.tokens.
+
+        Returns (first, last, count): the old tokens [first, last) have been
+        replaced by `count` new ones.
+        """
+        delta = inserted - deleted
+        old = self.tokens
+
+        # The first token touching the edit may grow or shrink, so start there.
+        first = 0
+        while old[first].end < offset and old[first].type != token.EOF:
+            first += 1
+
+        l = lexer.Lexer(self.input, min(old[first].start, offset))
+        relexed: List[token.Token] = []
+        last = first
+
+        while True:
+            tok = l.next_token()
+
+            # Past the edit, a token identical to an old one at the same
+            # (shifted) place means the rest of the old stream is still valid.
+            if tok.start >= offset + inserted:
+                while old[last].start + delta < tok.start and old[last].type != token.EOF:
+                    last += 1
+                candidate = old[last]
+                if candidate.start >= offset + deleted and candidate.start + delta == tok.start \
+                        and candidate.type == tok.type and candidate.literal == tok.literal:
+                    break
+
+            relexed.append(tok)
+            if tok.type == token.EOF:
+                last = len(old)
+                break
+
+        for tok in old[last:]:
+            tok.start += delta
+            tok.end += delta
+
+        self.tokens = old[:first] + relexed + old[last:]
+
+        return first, last, len(relexed)
+
+    def reparse(self, first: int, last: int, count: int):
+        """Re-parse the statements depending on the tokens replaced by relex."""
+        shift = count - (last - first)
+        old = self.entries
+
+        # Statements ending before the damage are kept, including the lookahead token.
+        k = 0
+        while k < len(old) and old[k].end < first:
+            k += 1
+
+        start = old[k].start if k < len(old) else (old[-1].end if len(old) > 0 else 0)
+        old_starts = [e.start for e in old]
+
+        entries = old[:k]
+        tail: List[Entry] = []
+        for entry in self.parse_from(start):
+            entries.append(entry)
+            if entry.end < first + count:
+                continue
+
+            # Resume reusing old statements once we are back on an old boundary.
+            i = bisect_left(old_starts, entry.end - shift, k)
+            if i < len(old) and old[i].start == entry.end - shift and old[i].start >= last:
+                tail = old[i:]
+                break
+
+        for entry in tail:
+            entry.start += shift
+            entry.end += shift
+
+        self.entries = entries + tail
+
+    def parse_from(self, index: int) -> Iterator[Entry]:
+        """Parse top-level statements starting at the token `index`."""
+        stream = lexer.TokenStream(self.tokens, index)
+        p = Parser(stream)
+
+        while not p.cur_token_is(token.EOF):
+            n = len(p.errors)
+            stmt = p.parse_statement()
+            p.next_token()
+
+            # cur_token is now the first token of the next statement
+            end = min(stream.position - 2, len(self.tokens) - 1)
+            yield Entry(index, end, stmt, p.errors[n:])
+            index = end
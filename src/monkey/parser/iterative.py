@@ -0,0 +1,305 @@
+from typing import Callable, Dict, Generator, List, Union
+
+from monkey import ast, lexer, token
+from .parser import LOWEST, PREFIX, Parser, precedences
+
+ParseGen = Generator
+
+
+class IterativeParser(Parser):
+    """A Parser which handles arbitrarily deep nesting in bounded Python stack.
+
+    Every parse function that can recurse has a generator twin here. Instead
+    of calling another parse function, a generator yields the generator of
+    the sub-parse and receives its result. run() drives these generators from
+    an explicit stack, so nesting depth only grows that list. The generators
+    mirror the recursive functions step by step, and therefore produce the
+    same AST and the same errors.
+    """
+
+    def __init__(self, l: lexer.Lexer, **kwargs):
+        super().__init__(l, **kwargs)
+
+        self.prefix_parse_gens: Dict[token.TokenType, Callable[..., ParseGen]] = {
+            token.BANG: self.gen_prefix_expression,
+            token.MINUS: self.gen_prefix_expression,
+            token.LPAREN: self.gen_grouped_expression,
+            token.IF: self.gen_if_expression,
+            token.FUNCTION: self.gen_function_literal,
+            token.LBRACKET: self.gen_array_literal,
+            token.LBRACE: self.gen_hash_literal,
+        }
+        self.infix_parse_gens: Dict[token.TokenType, Callable[..., ParseGen]] = {
+            token.PLUS: self.gen_infix_expression,
+            token.MINUS: self.gen_infix_expression,
+            token.SLASH: self.gen_infix_expression,
+            token.ASTERISK: self.gen_infix_expression,
+            token.EQ: self.gen_infix_expression,
+            token.NOT_EQ: self.gen_infix_expression,
+            token.LT: self.gen_infix_expression,
+            token.GT: self.gen_infix_expression,
+            token.LPAREN: self.gen_call_expression,
+            token.LBRACKET: self.gen_index_expression,
+        }
+
+    @staticmethod
+    def run(gen: ParseGen):
+        """Drive a parse generator and the sub-parses it yields to completion."""
+        stack = [gen]
+        value = None
+
+        while True:
+            try:
+                child = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                if len(stack) == 0:
+                    return stop.value
+                value = stop.value
+            else:
+                stack.append(child)
+                value = None
+
+    def parse_statement(self) -> Union[ast.Statement, None]:
+        return self.run(self.gen_statement())
+
+    def parse_expression(self, precedence: int) -> Union[ast.Expression, None]:
+        return self.run(self.gen_expression(precedence))
+
+    def gen_statement(self) -> ParseGen:
+        if self.cur_token.type == token.LET:
+            return (yield self.gen_let_statement())
+        elif self.cur_token.type == token.RETURN:
+            return (yield self.gen_return_statement())
+        else:
+            return (yield self.gen_expression_statement())
+
+    def gen_let_statement(self) -> ParseGen:
+        stmt = ast.LetStatement(self.cur_token)
+
+        if not self.expect_peek(token.IDENT):
+            return None
+
+        stmt.name = ast.Identifier(self.cur_token, self.cur_token.literal)
+
+        if not self.expect_peek(token.ASSIGN):
+            return None
+
+        self.next_token()
+
+        stmt.value = yield self.gen_expression(LOWEST)
+
+        if self.peek_token_is(token.SEMICOLON):
+            self.next_token()
+
+        return stmt
+
+    def gen_return_statement(self) -> ParseGen:
+        stmt = ast.ReturnStatement(self.cur_token)
+
+        self.next_token()
+
+        stmt.return_value = yield self.gen_expression(LOWEST)
+
+        if self.peek_token_is(token.SEMICOLON):
+            self.next_token()
+
+        return stmt
+
+    def gen_expression_statement(self) -> ParseGen:
+        stmt = ast.ExpressionStatement(self.cur_token)
+
+        stmt.expression = yield self.gen_expression(LOWEST)
+
+        if self.peek_token_is(token.SEMICOLON):
+            self.next_token()
+
+        return stmt
+
+    def gen_expression(self, precedence: int) -> ParseGen:
+        prefix_gen = self.prefix_parse_gens.get(self.cur_token.type)
+        if prefix_gen is not None:
+            left_exp = yield prefix_gen()
+        else:
+            prefix = self.prefix_fn(self.cur_token.type)
+            if prefix is None:
+                self.no_prefix_parse_fn_error(self.cur_token.type)
+                return None
+            left_exp = prefix()
+
+        peek_type = self.peek_token.type
+        while peek_type != token.SEMICOLON and precedence < precedences.get(peek_type, LOWEST):
+            infix_gen = self.infix_parse_gens.get(peek_type)
+            if infix_gen is not None:
+                self.next_token()
+                left_exp = yield infix_gen(left_exp)
+            else:
+                infix = self.infix_fn(peek_type)
+                if infix is None:
+                    return left_exp
+                self.next_token()
+                left_exp = infix(left_exp)
+            peek_type = self.peek_token.type
+
+        return left_exp
+
+    def gen_prefix_expression(self) -> ParseGen:
+        expression = ast.PrefixExpression(self.cur_token, self.cur_token.literal)
+
+        self.next_token()
+
+        expression.right = yield self.gen_expression(PREFIX)
+
+        return expression
+
+    def gen_infix_expression(self, left: ast.Expression) -> ParseGen:
+        expression = ast.InfixExpression(self.cur_token, left, self.cur_token.literal)
+
+        precedence = self.cur_precedence()
+        self.next_token()
+        expression.right = yield self.gen_expression(precedence)
+
+        return expression
+
+    def gen_if_expression(self) -> ParseGen:
+        expression = ast.IfExpression(self.cur_token)
+
+        if not self.expect_peek(token.LPAREN):
+            return None
+
+        self.next_token()
+        expression.condition = yield self.gen_expression(LOWEST)
+
+        if not self.expect_peek(token.RPAREN):
+            return None
+
+        if not self.expect_peek(token.LBRACE):
+            return None
+
+        expression.consequence = yield self.gen_block_statement()
+
+        if self.peek_token_is(token.ELSE):
+            self.next_token()
+
+            if not self.expect_peek(token.LBRACE):
+                return None
+
+            expression.alternative = yield self.gen_block_statement()
+
+        return expression
+
+    def gen_block_statement(self) -> ParseGen:
+        block = ast.BlockStatement(self.cur_token)
+        block.statements = []
+
+        self.next_token()
+
+        while not self.cur_token_is(token.RBRACE) and not self.cur_token_is(token.EOF):
+            start = self.cur_token
+            stmt = yield self.gen_statement()
+            ended = False
+            if self.panicking:
+                stmt = self.error_statement(start, stmt)
+                ended = self.synchronize(True)
+            if stmt is not None:
+                block.statements.append(stmt)
+            if ended:
+                break
+            self.next_token()
+
+        return block
+
+    def gen_function_literal(self) -> ParseGen:
+        lit = ast.FunctionLiteral(self.cur_token)
+
+        if not self.expect_peek(token.LPAREN):
+            return None
+
+        lit.parameters = self.parse_function_parameters()
+
+        if not self.expect_peek(token.LBRACE):
+            return None
+
+        if self.lazy_functions:
+            lit.body = self.lazy_block_statement()
+        else:
+            lit.body = yield self.gen_block_statement()
+
+        return lit
+
+    def gen_call_expression(self, function: ast.Expression) -> ParseGen:
+        exp = ast.CallExpression(self.cur_token, function)
+        exp.arguments = yield self.gen_expression_list(token.RPAREN)
+        return exp
+
+    def gen_expression_list(self, end: token.TokenType) -> ParseGen:
+        list: List[ast.Expression] = []
+
+        if self.peek_token_is(end):
+            self.next_token()
+            return list
+
+        self.next_token()
+        list.append((yield self.gen_expression(LOWEST)))
+
+        while self.peek_token_is(token.COMMA):
+            self.next_token()
+            self.next_token()
+            list.append((yield self.gen_expression(LOWEST)))
+
+        if not self.expect_peek(end):
+            return None
+
+        return list
+
+    def gen_array_literal(self) -> ParseGen:
+        array = ast.ArrayLiteral(self.cur_token)
+
+        array.elements = yield self.gen_expression_list(token.RBRACKET)
+
+        return array
+
+    def gen_index_expression(self, left: ast.Expression) -> ParseGen:
+        exp = ast.IndexExpression(self.cur_token, left)
+
+        self.next_token()
+        exp.index = yield self.gen_expression(LOWEST)
+
+        if not self.expect_peek(token.RBRACKET):
+            return None
+
+        return exp
+
+    def gen_grouped_expression(self) -> ParseGen:
+        self.next_token()
+
+        exp = yield self.gen_expression(LOWEST)
+
+        if not self.expect_peek(token.RPAREN):
+            return None
+
+        return exp
+
+    def gen_hash_literal(self) -> ParseGen:
+        hash = ast.HashLiteral(self.cur_token)
+        hash.pairs = {}
+
+        while not self.peek_token_is(token.RBRACE):
+            self.next_token()
+            key = yield self.gen_expression(LOWEST)
+
+            if not self.expect_peek(token.COLON):
+                return None
+
+            self.next_token()
+            value = yield self.gen_expression(LOWEST)
+
+            hash.pairs[key] = value
+
+            if not self.peek_token_is(token.RBRACE) and not self.expect_peek(token.COMMA):
+                return None
+
+        if not self.expect_peek(token.RBRACE):
+            return None
+
+        return hash
@@ -0,0 +1,160 @@
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Tuple
+
+from monkey import ast, lexer, token
+from .parser import Parser
+
+# Everything the boundary scan has to look at: string literals (which may hide
+# any of the other tokens), brackets, semicolons and the statement keywords.
+scan_pattern = re.compile(r'"[^"]*"?|[(){}\[\];]|\blet\b|\breturn\b')
+
+# Last chars of tokens which can end an expression. A `;` or a `let` or
+# `return` directly after one of these ends or starts a statement, unless
+# the token is one of the keywords below.
+expression_end_chars = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_0123456789")]}')
+word_chars = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_0123456789')
+statement_keywords = {'let', 'return', 'fn', 'if', 'else'}
+
+Chunk = Tuple[str, int, token.Token]
+ChunkResult = Tuple[List[ast.Statement], List[str], List[int], bool]
+
+
+def ends_expression(input: str, end: int) -> bool:
+    """Report whether the last token before offset `end` can end an expression."""
+    i = end - 1
+    while i >= 0 and input[i] in ' \t\n\r':
+        i -= 1
+    if i < 0 or input[i] not in expression_end_chars:
+        return False
+
+    j = i
+    while j >= 0 and input[j] in word_chars:
+        j -= 1
+    return input[j + 1:i + 1] not in statement_keywords
+
+
+def statement_boundaries(input: str) -> List[int]:
+    """Return the source offsets at which a top-level statement likely starts.
+
+    Only boundaries outside balanced braces, brackets and parens are reported:
+    after a `;` or before a `let`/`return`, if they follow the end of an
+    expression. The first offset is always 0. On invalid input the parser
+    may still run past a boundary, which ParallelParser detects and repairs.
+    """
+    boundaries = [0]
+    depth = 0
+
+    for m in scan_pattern.finditer(input):
+        s = m.group()
+        if s in '({[':
+            depth += 1
+        elif s in ')}]':
+            depth = max(depth - 1, 0)
+        elif depth != 0 or s[0] == '"':
+            continue
+        elif ends_expression(input, m.start()):
+            boundaries.append(m.end() if s == ';' else m.start())
+
+    return boundaries
+
+
+def parse_chunk(chunk: Chunk) -> ChunkResult:
+    """Lex and parse the statements of one chunk of source.
+
+    `lookahead` is the first token after the chunk (or EOF), so that the
+    parser sees the same lookahead as a serial parse would at the end of the
+    chunk. Token and error offsets are relative to the whole source.
+
+    The chunk is clean if its last statement ends right before `lookahead`,
+    that is if a serial parse would start a new statement there as well.
+    """
+    input, offset, lookahead = chunk
+
+    tokens = lexer.tokenize(input)
+    tokens.pop()
+    for tok in tokens:
+        tok.start += offset
+        tok.end += offset
+    tokens.append(lookahead)
+
+    stream = lexer.TokenStream(tokens)
+    p = Parser(stream)
+    statements: List[ast.Statement] = []
+
+    while stream.position - 2 < len(tokens) - 1 and not p.cur_token_is(token.EOF):
+        stmt = p.parse_statement()
+        if stmt is not None:
+            statements.append(stmt)
+        p.next_token()
+
+    clean = stream.position - 2 == len(tokens) - 1
+    return statements, p.errors, p.error_offsets, clean
+
+
+class ParallelParser:
+    """Parses a program by splitting the source into chunks of top-level
+    statements and lexing and parsing the chunks in a process pool.
+
+    The statements come back in source order, and token and error offsets
+    refer to positions in the whole input. The result is the same as
+    Parser.parse_program for valid programs.
+    """
+
+    def __init__(self, input: str, max_workers: int = None, chunk_size: int = 100000,
+                 executor: Executor = None):
+        self.input = input
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size  # minimum number of chars per chunk
+        self.executor = executor
+
+        self.errors: List[str] = []
+        self.error_offsets: List[int] = []
+
+    def chunks(self) -> List[Chunk]:
+        boundaries = statement_boundaries(self.input)
+        boundaries.append(len(self.input))
+        chunks: List[Chunk] = []
+
+        start = 0
+        for b in boundaries[1:]:
+            if b - start >= self.chunk_size or b == len(self.input):
+                lookahead = lexer.Lexer(self.input, b).next_token()
+                chunks.append((self.input[start:b], start, lookahead))
+                start = b
+
+        return chunks
+
+    def parse_program(self) -> ast.Program:
+        chunks = self.chunks()
+
+        if len(chunks) <= 1 or self.max_workers == 1:
+            results = map(parse_chunk, chunks)
+        elif self.executor is not None:
+            results = self.executor.map(parse_chunk, chunks)
+        else:
+            with ProcessPoolExecutor(self.max_workers) as executor:
+                results = list(executor.map(parse_chunk, chunks))
+
+        program = ast.Program()
+        results = list(results)
+        i = 0
+        while i < len(chunks):
+            statements, errors, error_offsets, clean = results[i]
+
+            # The statement at the end of chunk i ran into the next chunk, so
+            # parse both as one chunk, and so on until a boundary holds.
+            j = i
+            while not clean and j + 1 < len(chunks):
+                j += 1
+                _, offset, _ = chunks[i]
+                end_input, end_offset, lookahead = chunks[j]
+                merged = self.input[offset:end_offset + len(end_input)]
+                statements, errors, error_offsets, clean = parse_chunk((merged, offset, lookahead))
+
+            program.statements.extend(statements)
+            self.errors.extend(errors)
+            self.error_offsets.extend(error_offsets)
+            i = j + 1
+
+        return program
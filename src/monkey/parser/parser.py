@@ -1,10 +1,11 @@
-from enum import Enum
+from enum import IntEnum
+from functools import partial
 from typing import Callable, Dict, List, Union
 
 from monkey import ast, lexer, token
 
 
-class Precedence(Enum):
+class Precedence(IntEnum):
     LOWEST = 1
     EQUALS = 2       # ==
     LESSGREATER = 3  # > or <
@@ -15,17 +16,22 @@ class Precedence(Enum):
     INDEX = 8        # array[index]
 
 
-precedences = {
-    token.EQ: Precedence.EQUALS,
-    token.NOT_EQ: Precedence.EQUALS,
-    token.LT: Precedence.LESSGREATER,
-    token.GT: Precedence.LESSGREATER,
-    token.PLUS: Precedence.SUM,
-    token.MINUS: Precedence.SUM,
-    token.SLASH: Precedence.PRODUCT,
-    token.ASTERISK: Precedence.PRODUCT,
-    token.LPAREN: Precedence.CALL,
-    token.LBRACKET: Precedence.INDEX,
+# Plain ints are used in the hot paths of the parser, as comparing them is
+# much cheaper than going through the Enum.
+LOWEST = int(Precedence.LOWEST)
+PREFIX = int(Precedence.PREFIX)
+
+precedences: Dict[token.TokenType, int] = {
+    token.EQ: int(Precedence.EQUALS),
+    token.NOT_EQ: int(Precedence.EQUALS),
+    token.LT: int(Precedence.LESSGREATER),
+    token.GT: int(Precedence.LESSGREATER),
+    token.PLUS: int(Precedence.SUM),
+    token.MINUS: int(Precedence.SUM),
+    token.SLASH: int(Precedence.PRODUCT),
+    token.ASTERISK: int(Precedence.PRODUCT),
+    token.LPAREN: int(Precedence.CALL),
+    token.LBRACKET: int(Precedence.INDEX),
 }
 
 
@@ -35,9 +41,20 @@ infix_parse_fn = Callable[[ast.Expression], ast.Expression]
 
 class Parser:
 
-    def __init__(self, l: lexer.Lexer):
+    def __init__(self, l: lexer.Lexer, recover: bool = False, max_errors: int = None, lazy_functions: bool = False):
         self.l = l
         self.errors: List[str] = []
+        self.error_offsets: List[int] = []  # source offset of the token each error refers to
+
+        # In recovery mode the first error puts the parser in panic mode, in
+        # which further errors are dropped until it has skipped to the next
+        # statement. The bad statement is kept as an ast.ErrorStatement.
+        self.recover = recover
+        self.max_errors = max_errors
+        self.panicking = False
+
+        # Function bodies are only brace-matched, and parsed on first use.
+        self.lazy_functions = lazy_functions
 
         self.cur_token: token.Token = None
         self.peek_token: token.Token = None
@@ -69,6 +86,10 @@ class Parser:
         self.register_infix(token.LPAREN, self.parse_call_expression)
         self.register_infix(token.LBRACKET, self.parse_index_expression)
 
+        # Bound lookups, so parse_expression does a single call per table
+        self.prefix_fn = self.prefix_parse_fns.get
+        self.infix_fn = self.infix_parse_fns.get
+
         # Read two tokens, so cur_token and peek_token are both set
         self.next_token()
         self.next_token()
@@ -91,19 +112,68 @@ class Parser:
             self.peek_error(t)
             return False
 
+    def add_error(self, msg: str, tok: token.Token):
+        if self.panicking or self.error_limit_reached():
+            return
+        self.errors.append(msg)
+        self.error_offsets.append(tok.start)
+        self.panicking = self.recover
+
+    def error_limit_reached(self) -> bool:
+        return self.max_errors is not None and len(self.errors) >= self.max_errors
+
+    def error_statement(self, start: token.Token, partial: Union[ast.Statement, None]) -> ast.ErrorStatement:
+        return ast.ErrorStatement(start, self.errors[-1], partial)
+
+    def synchronize(self, in_block: bool) -> bool:
+        """Skip the rest of a statement that caused an error and leave panic mode.
+
+        Stops on the last token of the bad statement: a `;`, the token before a
+        `let` or `return`, or a `}` closing the enclosing block, skipping over
+        nested braces. Returns True if the enclosing block (or the input)
+        ended, in which case cur_token is its closing `}` (or EOF).
+        """
+        self.panicking = False
+        depth = 0
+
+        while True:
+            t = self.cur_token.type
+            if t == token.EOF:
+                return True
+            elif t == token.LBRACE:
+                depth += 1
+            elif t == token.RBRACE:
+                if depth == 0:
+                    return in_block
+                depth -= 1
+            elif t == token.SEMICOLON and depth == 0:
+                return False
+
+            if depth == 0:
+                peek = self.peek_token.type
+                if peek == token.LET or peek == token.RETURN or peek == token.EOF \
+                        or (in_block and peek == token.RBRACE):
+                    return False
+
+            self.next_token()
+
     def peek_error(self, t: token.TokenType):
         msg = 'expected next token to be {}, got {} instead'.format(t, self.peek_token.type)
-        self.errors.append(msg)
+        self.add_error(msg, self.peek_token)
 
     def no_prefix_parse_fn_error(self, t: token.TokenType):
         msg = 'no prefix parse function for {} found'.format(t)
-        self.errors.append(msg)
+        self.add_error(msg, self.cur_token)
 
     def parse_program(self) -> ast.Program:
         program = ast.Program()
 
-        while self.cur_token.type != token.EOF:
+        while self.cur_token.type != token.EOF and not self.error_limit_reached():
+            start = self.cur_token
             stmt = self.parse_statement()
+            if self.panicking:
+                stmt = self.error_statement(start, stmt)
+                self.synchronize(False)
             if stmt is not None:
                 program.statements.append(stmt)
             self.next_token()
@@ -131,7 +201,7 @@ class Parser:
 
         self.next_token()
 
-        stmt.value = self.parse_expression(Precedence.LOWEST)
+        stmt.value = self.parse_expression(LOWEST)
 
         if self.peek_token_is(token.SEMICOLON):
             self.next_token()
@@ -143,7 +213,7 @@ class Parser:
 
         self.next_token()
 
-        stmt.return_value = self.parse_expression(Precedence.LOWEST)
+        stmt.return_value = self.parse_expression(LOWEST)
 
         if self.peek_token_is(token.SEMICOLON):
             self.next_token()
@@ -153,43 +223,39 @@ class Parser:
     def parse_expression_statement(self) -> ast.ExpressionStatement:
         stmt = ast.ExpressionStatement(self.cur_token)
 
-        stmt.expression = self.parse_expression(Precedence.LOWEST)
+        stmt.expression = self.parse_expression(LOWEST)
 
         if self.peek_token_is(token.SEMICOLON):
             self.next_token()
 
         return stmt
 
-    def parse_expression(self, precedence: Precedence) -> Union[ast.Expression, None]:
-        if self.cur_token.type not in self.prefix_parse_fns:
+    def parse_expression(self, precedence: int) -> Union[ast.Expression, None]:
+        prefix = self.prefix_fn(self.cur_token.type)
+        if prefix is None:
             self.no_prefix_parse_fn_error(self.cur_token.type)
             return None
-        prefix = self.prefix_parse_fns[self.cur_token.type]
         left_exp = prefix()
 
         # ここが山場だ！ 1 + 2 * 3
-        while not self.peek_token_is(token.SEMICOLON) and precedence.value < self.peek_precedence().value:
-            if self.peek_token.type not in self.infix_parse_fns:
+        peek_type = self.peek_token.type
+        while peek_type != token.SEMICOLON and precedence < precedences.get(peek_type, LOWEST):
+            infix = self.infix_fn(peek_type)
+            if infix is None:
                 return left_exp
-            infix = self.infix_parse_fns[self.peek_token.type]
 
             self.next_token()
 
             left_exp = infix(left_exp)
+            peek_type = self.peek_token.type
 
         return left_exp
 
-    def peek_precedence(self) -> Precedence:
-        if self.peek_token.type in precedences:
-            return precedences[self.peek_token.type]
+    def peek_precedence(self) -> int:
+        return precedences.get(self.peek_token.type, LOWEST)
 
-        return Precedence.LOWEST
-
-    def cur_precedence(self) -> Precedence:
-        if self.cur_token.type in precedences:
-            return precedences[self.cur_token.type]
-
-        return Precedence.LOWEST
+    def cur_precedence(self) -> int:
+        return precedences.get(self.cur_token.type, LOWEST)
 
     def parse_identifier(self) -> ast.Expression:
         return ast.Identifier(self.cur_token, self.cur_token.literal)
@@ -199,7 +265,7 @@ class Parser:
 
         if not self.cur_token.literal.isdigit():
             msg = "could not parse '{}' as integer".format(self.cur_token.literal)
-            self.errors.append(msg)
+            self.add_error(msg, self.cur_token)
             return None
 
         lit.value = int(self.cur_token.literal)
@@ -214,7 +280,7 @@ class Parser:
 
         self.next_token()
 
-        expression.right = self.parse_expression(Precedence.PREFIX)
+        expression.right = self.parse_expression(PREFIX)
 
         return expression
 
@@ -237,7 +303,7 @@ class Parser:
             return None
 
         self.next_token()
-        expression.condition = self.parse_expression(Precedence.LOWEST)
+        expression.condition = self.parse_expression(LOWEST)
 
         if not self.expect_peek(token.RPAREN):
             return None
@@ -264,9 +330,16 @@ class Parser:
         self.next_token()
 
         while not self.cur_token_is(token.RBRACE) and not self.cur_token_is(token.EOF):
+            start = self.cur_token
             stmt = self.parse_statement()
+            ended = False
+            if self.panicking:
+                stmt = self.error_statement(start, stmt)
+                ended = self.synchronize(True)
             if stmt is not None:
                 block.statements.append(stmt)
+            if ended:
+                break
             self.next_token()
 
         return block
@@ -282,10 +355,32 @@ class Parser:
         if not self.expect_peek(token.LBRACE):
             return None
 
-        lit.body = self.parse_block_statement()
+        if self.lazy_functions:
+            lit.body = self.lazy_block_statement()
+        else:
+            lit.body = self.parse_block_statement()
 
         return lit
 
+    def lazy_block_statement(self) -> ast.LazyBlockStatement:
+        """Skip to the `}` matching the current `{`, keeping the tokens in between."""
+        tokens = [self.cur_token]
+        depth = 1
+
+        while depth > 0:
+            self.next_token()
+            t = self.cur_token.type
+            if t == token.EOF:
+                break
+            elif t == token.LBRACE:
+                depth += 1
+            elif t == token.RBRACE:
+                depth -= 1
+            tokens.append(self.cur_token)
+
+        options = {'recover': self.recover, 'max_errors': self.max_errors, 'lazy_functions': True}
+        return ast.LazyBlockStatement(tokens[0], tokens, partial(parse_lazy_body, self.__class__, options))
+
     def parse_function_parameters(self) -> Union[List[ast.Identifier], None]:
         identifiers: List[ast.Identifier] = []
 
@@ -322,12 +417,12 @@ class Parser:
             return list
 
         self.next_token()
-        list.append(self.parse_expression(Precedence.LOWEST))
+        list.append(self.parse_expression(LOWEST))
 
         while self.peek_token_is(token.COMMA):
             self.next_token()
             self.next_token()
-            list.append(self.parse_expression(Precedence.LOWEST))
+            list.append(self.parse_expression(LOWEST))
 
         if not self.expect_peek(end):
             return None
@@ -345,7 +440,7 @@ class Parser:
         exp = ast.IndexExpression(self.cur_token, left)
 
         self.next_token()
-        exp.index = self.parse_expression(Precedence.LOWEST)
+        exp.index = self.parse_expression(LOWEST)
 
         if not self.expect_peek(token.RBRACKET):
             return None
@@ -355,7 +450,7 @@ class Parser:
     def parse_grouped_expression(self) -> Union[ast.Expression, None]:
         self.next_token()
 
-        exp = self.parse_expression(Precedence.LOWEST)
+        exp = self.parse_expression(LOWEST)
 
         if not self.expect_peek(token.RPAREN):
             return None
@@ -368,13 +463,13 @@ class Parser:
 
         while not self.peek_token_is(token.RBRACE):
             self.next_token()
-            key = self.parse_expression(Precedence.LOWEST)
+            key = self.parse_expression(LOWEST)
 
             if not self.expect_peek(token.COLON):
                 return None
 
             self.next_token()
-            value = self.parse_expression(Precedence.LOWEST)
+            value = self.parse_expression(LOWEST)
 
             hash.pairs[key] = value
 
@@ -391,3 +486,9 @@ class Parser:
 
     def register_infix(self, token_type: token.TokenType, fn: infix_parse_fn):
         self.infix_parse_fns[token_type] = fn
+
+
+def parse_lazy_body(parser_class: type, options: Dict, tokens: List[token.Token]):
+    """Parse the tokens of a lazy function body into a BlockStatement."""
+    p = parser_class(lexer.TokenStream(tokens), **options)
+    return p.parse_block_statement(), p.errors
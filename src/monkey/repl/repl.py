@@ -7,6 +7,7 @@ def start():
     env = object.Environment()
 
     while True:
+        evaluator.output.flush()
         line = input(PROMPT)
         if not line:
             return
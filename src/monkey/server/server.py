@@ -0,0 +1,209 @@
+import asyncio
+import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Tuple
+
+from monkey import batch
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout',
+}
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Server:
+    """Evaluates Monkey scripts sent over HTTP on a pool of warm workers.
+
+    POST /eval takes a JSON object with either the `source` of a script or
+    the `script` id of a file in `scripts_dir`, and answers with the fields
+    of its batch.ScriptResult. GET /health reports the load of the server.
+
+    At most `max_concurrency` scripts are evaluated at a time, and at most
+    `max_queued` more wait for a worker; further requests are refused with
+    503. A script is stopped after `timeout` seconds by its evaluation
+    budget. If its worker does not answer within a second more, the request
+    fails with 504.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, max_workers: int = None,
+                 timeout: float = 10.0, max_concurrency: int = None, max_queued: int = 100,
+                 scripts_dir: str = None, max_body: int = 1 << 20, executor: Executor = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_queued = max_queued
+        self.scripts_dir = os.path.abspath(scripts_dir) if scripts_dir is not None else None
+        self.max_body = max_body
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.executor = executor
+        self.owns_executor = executor is None
+        if executor is None:
+            self.executor = ProcessPoolExecutor(max_workers, initializer=batch.warm_up)
+        if max_concurrency is None:
+            max_concurrency = max_workers
+        self.slots = asyncio.Semaphore(max_concurrency)
+
+        self.running = 0
+        self.queued = 0
+        self.served = 0
+        self.server: asyncio.AbstractServer = None
+
+    async def start(self):
+        # Start the workers before listening: workers forked later would
+        # inherit the sockets of open connections, and keep them open after
+        # the server has closed them
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, batch.warm_up)
+                               for _ in range(self.max_workers)))
+
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.owns_executor:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, path, body = await read_request(reader, self.max_body)
+                status, response = await self.route(method, path, body)
+            except HTTPError as e:
+                status, response = e.status, {'error': str(e)}
+            write_response(writer, status, response)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        if path == '/health':
+            if method != 'GET':
+                raise HTTPError(405, 'use GET')
+            return 200, {'running': self.running, 'queued': self.queued, 'served': self.served}
+        if path == '/eval':
+            if method != 'POST':
+                raise HTTPError(405, 'use POST')
+            return 200, await self.evaluate(self.script(body))
+        raise HTTPError(404, 'no such endpoint: {}'.format(path))
+
+    def script(self, body: bytes) -> batch.Script:
+        try:
+            request = json.loads(body)
+        except ValueError as e:
+            raise HTTPError(400, 'invalid JSON: {}'.format(e))
+        if not isinstance(request, dict):
+            raise HTTPError(400, 'expected a JSON object')
+
+        if isinstance(request.get('source'), str):
+            return batch.Source('<request>', request['source'])
+
+        script = request.get('script')
+        if not isinstance(script, str):
+            raise HTTPError(400, 'expected a `source` or a `script` string')
+        if self.scripts_dir is None:
+            raise HTTPError(404, 'no scripts are served')
+        path = os.path.abspath(os.path.join(self.scripts_dir, script))
+        if os.path.dirname(path) != self.scripts_dir or not os.path.isfile(path):
+            raise HTTPError(404, 'no such script: {}'.format(script))
+        return path
+
+    async def evaluate(self, script: batch.Script) -> Dict:
+        if self.slots.locked() and self.queued >= self.max_queued:
+            raise HTTPError(503, 'too many requests')
+
+        self.queued += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, batch.run_script, script, True, self.timeout)
+            try:
+                result = await asyncio.wait_for(future, self.timeout + 1.0)
+            except asyncio.TimeoutError:
+                raise HTTPError(504, 'time limit of {}s exceeded'.format(self.timeout))
+        finally:
+            self.running -= 1
+            self.slots.release()
+
+        self.served += 1
+        return {'ok': result.ok, 'result': result.result, 'output': result.output,
+                'error': result.error, 'timings': result.timings}
+
+
+async def read_request(reader: asyncio.StreamReader, max_body: int) -> Tuple[str, str, bytes]:
+    request_line = await reader.readline()
+    try:
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, 'malformed request line')
+
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            try:
+                length = int(value.strip())
+            except ValueError:
+                raise HTTPError(400, 'invalid Content-Length')
+
+    if length > max_body:
+        raise HTTPError(413, 'request body larger than {} bytes'.format(max_body))
+    body = await reader.readexactly(length) if length > 0 else b''
+    return method, path.split('?', 1)[0], body
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, response: Dict):
+    body = json.dumps(response).encode('utf-8')
+    head = 'HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'
+    writer.write(head.format(status, REASONS[status], len(body)).encode('latin-1') + body)
+
+
+def serve(**options):
+    """Run a Server with `options` until interrupted."""
+    async def main():
+        server = Server(**options)
+        await server.start()
+        print('serving on http://{}:{}'.format(server.host, server.port), flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -48,9 +48,11 @@ RETURN = 'RETURN'
 
 class Token:
 
-    def __init__(self, type: TokenType, literal: str):
+    def __init__(self, type: TokenType, literal: str, start: int = 0, end: int = 0):
         self.type = type
         self.literal = literal
+        self.start = start  # offset of the first char of the token in the source
+        self.end = end      # offset just past the last char of the token
 
     def __str__(self):
         return '{{Type:{} Literal:{}}}'.format(self.type, self.literal)
@@ -1,4 +1,6 @@
-from monkey import ast, token
+import pytest
+
+from monkey import ast, lexer, parser, token
 
 def test_string():
     program = ast.Program([
@@ -16,3 +18,120 @@ def test_string():
     ])
 
     assert program.string() == 'let myVar = anotherVar;', "program.string() wrong. got='{}'".format(program.string())
+
+
+def test_serialize_round_trip():
+    input = '''let add = fn(x, y) { return x + y; };
+let r = if (!true) { add(-1, 2) } else { [1, "two", 3][0] };
+let h = {"a": 1, 2: false};
+h["a"] * 3000000000000
+'''
+    program = parser.Parser(lexer.Lexer(input)).parse_program()
+
+    data = ast.dumps(program)
+    loaded = ast.loads(data)
+
+    assert len(loaded.statements) == len(program.statements)
+    for expected, got in zip(program.statements[:2] + program.statements[3:],
+                             loaded.statements[:2] + loaded.statements[3:]):
+        assert got.string() == expected.string()
+        assert (got.token.type, got.token.start, got.token.end) == \
+            (expected.token.type, expected.token.start, expected.token.end)
+
+    pairs = loaded.statements[2].value.pairs
+    assert [(k.string(), v.string()) for k, v in pairs.items()] == [('a', '1'), ('2', 'false')]
+    assert loaded.statements[1].value.consequence.statements[0].expression.arguments[0].right.value == 1
+
+
+def test_serialize_rejects_other_versions():
+    data = bytearray(ast.dumps(ast.Program()))
+    data[len(ast.MAGIC)] = ast.FORMAT_VERSION + 1
+
+    with pytest.raises(ValueError):
+        ast.loads(bytes(data))
+    with pytest.raises(ValueError):
+        ast.loads(b'not a program')
+
+
+def test_node_arena_round_trip():
+    input = '''let add = fn(x, y) { return x + y; };
+if (add(1, 2) > 2) { "big" } else { [-1, true][0] };
+{"a": 1}["a"]
+'''
+    program = parser.Parser(lexer.Lexer(input)).parse_program()
+
+    arena = ast.NodeArena.from_program(program)
+    root = arena.cursor()
+    assert root.kind_name == 'Program'
+    assert [c.kind_name for c in root.children()] == ['LetStatement', 'ExpressionStatement', 'ExpressionStatement']
+
+    fn = root.first_child().first_child().next_sibling()
+    assert fn.kind_name == 'FunctionLiteral'
+    assert [c.literal for c in fn.children()][1:] == ['x', 'y']
+    assert fn.start == input.index('fn')
+
+    if_exp = root.first_child().next_sibling().first_child()
+    assert [c.kind_name for c in if_exp.children()] == ['InfixExpression', 'BlockStatement', 'BlockStatement']
+
+    loaded = arena.to_program()
+    assert [s.string() for s in loaded.statements[:2]] == [s.string() for s in program.statements[:2]]
+    assert [(s.token.start, s.token.end) for s in loaded.statements] == \
+        [(s.token.start, s.token.end) for s in program.statements]
+    hash_index = loaded.statements[2].expression
+    assert [k.value for k in hash_index.left.pairs] == ['a']
+
+    program = parser.Parser(lexer.Lexer('let a = 1; let b = ; let = 2; a'), recover=True).parse_program()
+    arena = ast.NodeArena.from_program(program)
+    error = arena.cursor().first_child().next_sibling()
+    assert error.kind_name == 'ErrorStatement'
+    assert error.message == 'no prefix parse function for ; found'
+
+    loaded = arena.to_program()
+    assert [s.__class__.__name__ for s in loaded.statements] == \
+        [s.__class__.__name__ for s in program.statements]
+    assert [getattr(s, 'message', None) for s in loaded.statements] == \
+        [getattr(s, 'message', None) for s in program.statements]
+    assert loaded.string() == program.string()
+
+    # A partial parse can leave a child list as None; it stays None rather
+    # than coming back as an empty list.
+    program = parser.Parser(lexer.Lexer('let a = f(1, ; let b = [1, ; a'), recover=True).parse_program()
+    arena = ast.NodeArena.from_program(program)
+    assert len(arena.missing_lists) == 2
+    call, array = [arena.to_program().statements[i].partial.value for i in (0, 1)]
+    assert call.arguments is None
+    assert array.elements is None
+    assert ast.NodeArena.from_program(ast.Program([])).to_program().statements == []
+
+
+def test_write_streams_into_one_buffer(tmp_path):
+    input = 'let h = {"a": [1, 2], "b": f(x, -y)}; if (h) { h["a"] } else { fn(a, b) { a * b } }'
+    program = parser.Parser(lexer.Lexer(input)).parse_program()
+    expected = 'let h = {a:[1, 2], b:f(x, (-y))};ifh (h[a])else fn(a, b) (a * b)'
+
+    assert program.string() == expected
+
+    path = tmp_path / 'program.txt'
+    with open(str(path), 'w') as f:
+        program.write(f)
+    assert path.read_text() == expected
+
+
+def test_free_variables():
+    tests = [
+        ('fn(x) { x + y }', ['y']),
+        ('fn(x) { let y = x; y + z }', ['z']),
+        ('fn() { let a = a + 1; a }', ['a']),
+        ('fn() { if (c) { let b = 1; b } else { d } }', ['c', 'b', 'd']),
+        ('fn(x) { let go = fn(n) { go(n + x + y) }; go(1) }', ['y']),
+        ('fn() { len(puts) }', ['len', 'puts']),
+    ]
+
+    for input, expected in tests:
+        fn = parser.Parser(lexer.Lexer(input)).parse_program().statements[0].expression
+        assert ast.free_variables(fn) == expected, input
+
+    fn = parser.Parser(lexer.Lexer('fn(x) { let y = fn() { x + z }; y }'), lazy_functions=True) \
+        .parse_program().statements[0].expression
+    assert ast.free_variables(fn) == ['y', 'z']
+    assert not fn.body.parsed
@@ -0,0 +1,33 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from monkey import batch
+
+
+def test_run_script(tmp_path):
+    script = tmp_path / 'script.monkey'
+    script.write_text('let add = fn(a, b) { a + b }; puts("hi"); add(1, 2)')
+
+    result = batch.run_script(str(script))
+    assert result.ok
+    assert (result.name, result.result, result.output) == (str(script), '3', 'hi\n')
+    assert set(result.timings) == {'read', 'cache', 'lex', 'parse', 'eval'}
+
+    result = batch.run_script(batch.Source('fib', 'let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(30)'), timeout=0)
+    assert not result.ok
+    assert result.error == 'time limit of 0s exceeded'
+
+
+def test_run_batch():
+    sources = [batch.Source(str(i), 'let x = {}; x * x'.format(i)) for i in range(20)]
+    sources.append(batch.Source('bad', 'let x 1;'))
+
+    with ProcessPoolExecutor(2, initializer=batch.warm_up) as executor:
+        results = {r.name: r for r in batch.run_batch(sources, executor=executor)}
+        # a warm pool reuses its parsed programs
+        again = list(batch.run_batch(sources[:2] * 2, executor=executor))
+
+    assert len(results) == 21
+    for i in range(20):
+        assert results[str(i)].result == str(i * i)
+    assert results['bad'].error == 'expected next token to be =, got INT instead'
+    assert [r.result for r in again if r.name == '1'] == ['1', '1']
@@ -1,5 +1,11 @@
+import importlib
+import io
+import json
+import weakref
 from typing import Any, NamedTuple
 
+import pytest
+
 from monkey import evaluator, lexer, object, parser
 
 
@@ -273,6 +279,374 @@ def test_closures():
     _test_integer_object(_test_eval(input), 4)
 
 
+def test_flat_closures():
+    input = '''
+    let big = 100;
+    let outer = fn(x) {
+      let unused = [1, 2, 3];
+      let inner = fn(y) { fn(z) { x + y + z + big } };
+      inner(2)
+    };
+    outer(1)
+    '''
+
+    closure = _test_eval(input)
+    assert list(closure.env.store) == ['x', 'y']
+    assert closure.env.outer.outer is None
+
+    tests = [
+        ('let f = fn(a) { fn(b) { fn(c) { a + b + c } } }; f(1)(2)(3)', 6),
+        ('let f = fn(n) { let go = fn(k) { if (k == 0) { 0 } else { go(k - 1) + 1 } }; go(n) }; f(10)', 10),
+        ('let f = fn(a) { let g = fn() { h() }; let h = fn() { a }; g() }; f(9)', 9),
+        ('let f = fn(a) { fn() { len(a) } }; f("abc")()', 3),
+        # names the enclosing function binds again must not be copied early
+        ('let f = fn() { let x = 1; let g = fn() { x }; let x = 2; g() }; f()', 2),
+        ('let x = 1; let f = fn() { let g = fn() { x }; let x = 2; g() }; f()', 2),
+    ]
+
+    for input, expected in tests:
+        _test_integer_object(_test_eval(input), expected)
+
+
+def test_environment_lookup():
+    tests = [
+        ('let x = 5; let f = fn() { fn() { fn() { x + y } } }; let y = 10; f()()()', 15),
+        ('let f = fn(a) { fn() { let g = fn() { a }; g() } }; f(1)()', 1),
+        # the cached depth of `x` must not outlive the shadowing let
+        ('let x = 1; let f = fn(c) { if (c) { let x = 2; }; x }; f(false) + f(true) * 10 + f(false) * 100', 121),
+        ('let x = 1; let f = fn() { x }; let g = fn(x) { f() + x }; g(5) + f()', 7),
+        # closures of one literal with different flat environments
+        ('let x = 1; let mk = fn(c) { if (c) { let x = 2; }; fn() { x } }; '
+         'let a = mk(true); let b = mk(false); b() + a() * 10', 21),
+    ]
+
+    for input, expected in tests:
+        _test_integer_object(_test_eval(input), expected)
+
+    # the cache does not keep environments alive
+    env = object.Environment()
+    evaluator.eval(parser.Parser(lexer.Lexer('let f = fn(a) { fn() { a } }; let g = f([1]); g()')).parse_program(), env)
+    flat = weakref.ref(env.get('g')[0].env)
+    env.set('g', evaluator.NULL)
+    assert flat() is None
+
+
+def test_call_environments_are_recycled():
+    frames = evaluator.frames
+    allocations = frames.allocations
+
+    input = 'let f = fn(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }; f(15)'
+    _test_integer_object(_test_eval(input), 610)
+    assert frames.allocations - allocations <= 15
+
+    # a closure which keeps its defining call environment keeps it intact
+    input = '''
+    let f = fn(a) { let g = fn() { h() }; let h = fn() { a }; g };
+    let one = f(1);
+    let two = f(2);
+    one() + two() * 10
+    '''
+    _test_integer_object(_test_eval(input), 21)
+
+
+def test_memoize():
+    input = '''
+    let fib = memoize(fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } });
+    fib(40)
+    '''
+    _test_integer_object(_test_eval(input), 102334155)
+
+    env = object.Environment()
+    evaluated = evaluator.eval(parser.Parser(lexer.Lexer('''
+    let double = memoize(fn(x) { x * 2 }, 2);
+    double(1) + double(2) + double(1) + double(3) + double(2) + memoize(len)([1, 2])
+    ''')).parse_program(), env)
+    _test_integer_object(evaluated, 20)
+    double = env.get('double')[0]
+    assert double.cache.stats() == {'hits': 1, 'misses': 4, 'evictions': 2, 'size': 2}
+
+    evaluated = _test_eval('memoize(1)')
+    assert evaluated.message == 'argument to `memoize` must be FUNCTION, got INTEGER'
+
+
+def test_pure_function_cache(capsys):
+    cache = object.PureFunctionCache(16)
+    evaluator.use_pure_function_cache(cache)
+    try:
+        input = '''
+        let k = 10;
+        let f = fn(x) { x * k };
+        let g = fn(x) { puts(x); x };
+        let a = f(1) + f(1) + g(1) + g(1);
+        let k = 100;
+        a + f(1)
+        '''
+        _test_integer_object(_test_eval(input), 122)
+    finally:
+        evaluator.use_pure_function_cache(None)
+
+    # g is called twice since it has side effects, f is recomputed after k
+    # changed, which dropped the earlier entries
+    assert capsys.readouterr().out == '1\n1\n'
+    assert cache.hits == 1
+    assert cache.stats()['size'] == 1
+
+    # bindings reached through another function are not stale either
+    evaluator.use_pure_function_cache(object.PureFunctionCache(16))
+    try:
+        tests = [
+            ('let y = 1; let g = fn() { y }; let f = fn() { g() }; let r = f(); let y = 2; [r, f()]', '[1, 2]'),
+            ('let h = fn() { let y = 1; let g = fn() { y }; let f = fn() { g() }; let r = f(); '
+             'let y = 2; [r, f()] }; h()', '[1, 2]'),
+        ]
+        for input, expected in tests:
+            assert _test_eval(input).inspect() == expected
+    finally:
+        evaluator.use_pure_function_cache(None)
+
+
+def test_budget():
+    fib = 'let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15)'
+    build = 'let build = fn(n, a) { if (n == 0) { a } else { build(n - 1, push(a, n)) } }; ' \
+        'len(build(50, [' + ', '.join(['1'] * 500) + ']))'
+    tests = [
+        (fib, evaluator.Budget(max_steps=1000), 'step limit of 1000 exceeded'),
+        (fib, evaluator.Budget(timeout=0), 'time limit of 0s exceeded'),
+        (build, evaluator.Budget(max_objects=10000), 'object limit of 10000 exceeded'),
+        ('let f = fn(n) { f(n + 1) }; f(0)', evaluator.Budget(), 'maximum recursion depth exceeded'),
+    ]
+
+    for input, budget, expected in tests:
+        program = parser.Parser(lexer.Lexer(input)).parse_program()
+        evaluated = evaluator.eval(program, object.Environment(), budget)
+        assert issubclass(evaluated.__class__, object.Error), \
+            'no error object returned. got={} ({})'.format(evaluated.__class__.__name__, evaluated)
+        assert evaluated.message == expected
+
+    program = parser.Parser(lexer.Lexer(fib)).parse_program()
+    _test_integer_object(evaluator.eval(program, object.Environment(), evaluator.Budget(max_steps=100000)), 610)
+    _test_integer_object(evaluator.eval(program, object.Environment()), 610)
+
+
+def test_profiler():
+    input = """let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+let double = fn(x) { x * 2 };
+double(fib(3)) + len([1]) + fn() { 1 }()"""
+    ticks = iter(range(1000))
+    profiler = evaluator.Profiler(input, clock=lambda: next(ticks))
+
+    evaluator.use_profiler(profiler)
+    try:
+        _test_integer_object(_test_eval(input), 6)
+    finally:
+        evaluator.use_profiler(None)
+    profiler.finish()
+
+    calls = {label: stats.calls for label, stats in profiler.functions.items()}
+    assert calls == {'fib (1:11)': 5, 'double (2:14)': 1, 'len': 1, '<anonymous> (3:29)': 1}
+    stacks = {';'.join(stack) for stack in profiler.stacks}
+    assert stacks == {
+        '<program>',
+        '<program>;fib (1:11)',
+        '<program>;fib (1:11);fib (1:11)',
+        '<program>;fib (1:11);fib (1:11);fib (1:11)',
+        '<program>;double (2:14)',
+        '<program>;len',
+        '<program>;<anonymous> (3:29)',
+    }
+    # Every tick is accounted exactly once
+    assert sum(profiler.stacks.values()) == next(ticks) - 1
+    # Recursive calls count once towards the total time
+    assert profiler.functions['fib (1:11)'].total_time == 9
+
+    lines = io.StringIO()
+    profiler.write_collapsed(lines)
+    assert '<program>;fib (1:11);fib (1:11) 4000000\n' in lines.getvalue()
+    assert profiler.report().splitlines()[1].endswith('fib (1:11)')
+
+    # calling something which is not a function is still an error object
+    evaluator.use_profiler(evaluator.Profiler())
+    try:
+        assert _test_eval('let x = 1; x(2)').message == 'not a function: INTEGER'
+    finally:
+        evaluator.use_profiler(None)
+
+
+def test_node_counters():
+    input = """let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+fib(4)"""
+    counters = evaluator.NodeCounters(input)
+
+    evaluator.use_node_counters(counters)
+    try:
+        _test_integer_object(_test_eval(input), 3)
+    finally:
+        evaluator.use_node_counters(None)
+
+    counts = {(node['position'], node['kind']): node['count'] for node in counters.to_json()}
+    assert counts[('1:19', 'IfExpression')] == 9
+    assert counts[('1:25', 'InfixExpression')] == 9
+    assert counts[('1:46', 'CallExpression')] == 4
+    assert counts[('1:59', 'CallExpression')] == 4
+    assert counts[('2:4', 'CallExpression')] == 1
+    assert counts[('1:1', 'LetStatement')] == 1
+
+    if_expression = counters.nodes[(18, 'IfExpression')].node
+    assert counters.branches(if_expression) == (5, 4)
+    assert 'IfExpression (then 5, else 4)' in counters.report()
+
+    out = io.StringIO()
+    counters.write_json(out)
+    assert json.loads(out.getvalue()) == {'nodes': counters.to_json()}
+
+
+def test_environment_fork():
+    prelude = object.Environment()
+    evaluator.eval(parser.Parser(lexer.Lexer("""
+        let limit = 10;
+        let fact = fn(n) { if (n < 2) { 1 } else { n * fact(n - 1) } };
+        let below = fn(n) { n < limit };
+        let adder = fn(x) { fn(y) { x + y + limit } };
+    """)).parse_program(), prelude)
+    snapshot = dict(prelude.store)
+
+    def run(env, input):
+        return evaluator.eval(parser.Parser(lexer.Lexer(input)).parse_program(), env)
+
+    one = prelude.fork()
+    two = prelude.fork()
+    assert prelude.frozen and one.store == {} and one.outer is prelude
+
+    _test_integer_object(run(one, 'let x = fact(5); x'), 120)
+    assert run(two, 'x').message == 'identifier not found: x'
+
+    # a fork shadows the snapshot, whose functions keep seeing the snapshot
+    _test_integer_object(run(one, 'let limit = 1; limit'), 1)
+    _test_boolean_object(run(one, 'below(5)'), True)
+    _test_integer_object(run(two, 'limit'), 10)
+    assert prelude.store == snapshot
+
+    # globals of a fork behave as those of a fresh environment
+    tests = [
+        ('let y = 1; let f = fn() { y }; let y = 2; f()', 2),
+        ('let f = fn() { g() }; let g = fn() { 3 }; f()', 3),
+        ('let add = fn(a) { fn(b) { a + b + limit } }; add(1)(2)', 13),
+        ('let a = adder(1); let b = adder(2); a(100) + b(1000)', 1123),
+    ]
+    for input, expected in tests:
+        _test_integer_object(run(prelude.fork(), input), expected)
+
+    # cached lookup depths stay right when the same sites run in differently
+    # shadowed forks
+    program = parser.Parser(lexer.Lexer('let get = fn() { fn() { limit }() }; get()')).parse_program()
+    _test_integer_object(evaluator.eval(program, prelude.fork()), 10)
+    shadowed = prelude.fork()
+    shadowed.set('limit', object.Integer(5))
+    _test_integer_object(evaluator.eval(program, shadowed), 5)
+    _test_integer_object(evaluator.eval(program, prelude.fork()), 10)
+
+    with pytest.raises(ValueError, match='cannot bind x in a frozen environment'):
+        run(prelude, 'let x = 1;')
+
+
+def test_output_sink():
+    stream = io.StringIO()
+    sink = evaluator.OutputSink(stream, buffer_size=10)
+    sink.write('12345\n')
+    assert stream.getvalue() == ''
+    sink.write('67890\n')
+    assert stream.getvalue() == '12345\n67890\n'
+    sink.write('x')
+    sink.flush()
+    assert stream.getvalue() == '12345\n67890\nx'
+
+    # puts is buffered until the end of the evaluation
+    writes = []
+    stream = io.StringIO()
+    stream.write = lambda text: writes.append(text)
+    previous = evaluator.output.redirect(stream)
+    try:
+        _test_eval('let f = fn(n) { if (n > 0) { puts(n, "-"); f(n - 1) } }; f(3)')
+    finally:
+        evaluator.output.redirect(previous)
+    assert writes == ['3\n-\n2\n-\n1\n-\n']
+
+    with evaluator.output.capture() as captured:
+        _test_eval('puts("captured")')
+    assert captured.getvalue() == 'captured\n'
+    assert evaluator.output.stream is previous
+
+
+def test_file_builtins(tmp_path, monkeypatch):
+    path = str(tmp_path / 'data.txt')
+    _test_null_object(_test_eval('write_file("%s", "monkey")' % path))
+    assert open(path).read() == 'monkey'
+    with open(path, 'w') as f:
+        f.write('one\ntwo\r\nthree\n')
+
+    evaluated = _test_eval('read_file("%s")' % path)
+    assert evaluated.value == 'one\ntwo\r\nthree\n'
+    monkeypatch.setattr(importlib.import_module('monkey.evaluator.builtins'), 'MMAP_THRESHOLD', 0)
+    assert _test_eval('read_file("%s")' % path).value == 'one\ntwo\r\nthree\n'
+
+    lines = _test_eval('let lines = read_lines("%s"); [first(lines), first(rest(lines)), first(lines)]' % path)
+    assert [e.value for e in lines.elements] == ['one', 'two', 'one']
+    count = 'let count = fn(s, n) { if (first(s)) { count(rest(s), n + 1) } else { n } }; '
+    _test_integer_object(_test_eval(count + 'count(read_lines("%s"), 0)' % path), 3)
+    _test_null_object(_test_eval('rest(rest(rest(rest(read_lines("%s")))))' % path))
+
+    # the file is read one line at a time
+    sequence = _test_eval('rest(read_lines("%s"))' % path)
+    assert sequence.elements is not None and sequence.head is None
+
+    missing = str(tmp_path / 'missing.txt')
+    for input in ['read_file("%s")', 'read_lines("%s")']:
+        evaluated = _test_eval(input % missing)
+        assert evaluated.message.startswith('could not read %s: ' % missing)
+    assert _test_eval('write_file("%s", "x")' % str(tmp_path / 'no' / 'file')).message.startswith('could not write')
+    assert _test_eval('read_file(1)').message == 'argument to `read_file` must be STRING, got INTEGER'
+
+    with open(path, 'wb') as f:
+        f.write(b'ok\n\xff\n')
+    evaluated = _test_eval('let lines = read_lines("%s"); puts(first(lines)); first(rest(lines))' % path)
+    assert evaluated.message.startswith('could not read %s: ' % path)
+
+
+def test_json_builtins():
+    document = '{"name": "monkey", "tags": ["a", {"b": [1, true, null]}], "n": -3, "ok": false}'
+    program = parser.Parser(lexer.Lexer(
+        'let doc = json_parse(input, lazy); [doc["name"], doc["tags"][1]["b"][1], doc["n"], doc["ok"], doc["x"]]'
+    )).parse_program()
+
+    for lazy in [evaluator.FALSE, evaluator.TRUE]:
+        env = object.Environment()
+        env.set('input', object.String(document))
+        env.set('lazy', lazy)
+        assert evaluator.eval(program, env).inspect() == '[monkey, true, -3, false, null]'
+
+    env = object.Environment()
+    env.set('input', object.String(document))
+    doc = evaluator.eval(parser.Parser(lexer.Lexer('json_parse(input, true)')).parse_program(), env)
+    assert doc.__class__ is object.LazyHash and doc._pairs is None
+    assert doc.pairs[object.String('tags').hash_key()].value.elements[1]._pairs is None
+
+    env.set('doc', doc)
+    dumped = evaluator.eval(parser.Parser(lexer.Lexer('json_dump(doc)')).parse_program(), env)
+    assert json.loads(dumped.value) == json.loads(document)
+
+    tests = [
+        ('json_dump({"a": [1, "two", true, false, {}], 1: 2})', '{"a":[1,"two",true,false,{}],"1":2}'),
+        ('json_dump(json_parse(json_dump([1, "x"])))', '[1,"x"]'),
+        ('json_dump(fn(x) { x })', 'could not convert to JSON: unsupported type FUNCTION'),
+        ('json_parse("[1, 2")', "could not parse JSON: Expecting ',' delimiter: line 1 column 6 (char 5)"),
+        ('json_parse("1.5")', 'could not parse JSON: unsupported number 1.5'),
+        ('json_parse(1)', 'argument to `json_parse` must be STRING, got INTEGER'),
+    ]
+    for input, expected in tests:
+        evaluated = _test_eval(input)
+        assert (evaluated.value if evaluated.__class__ is object.String else evaluated.message) == expected
+
+
 def test_string_literal():
     input = '"Hello World!"'
 
@@ -482,6 +856,39 @@ def test_hash_index_expressions():
             _test_null_object(evaluated)
 
 
+def test_error_statement():
+    l = lexer.Lexer('let a = 1; let b = ; a')
+    p = parser.Parser(l, recover=True)
+    program = p.parse_program()
+    evaluated = evaluator.eval(program, object.Environment())
+
+    assert issubclass(evaluated.__class__, object.Error), \
+        'no error object returned. got={} ({})'.format(evaluated.__class__.__name__, evaluated)
+    assert evaluated.message == 'parse error: no prefix parse function for ; found'
+
+
+def test_lazy_function_bodies():
+    input = 'let f = fn(x) { let g = fn(y) { y * 2 }; g(x) + 1 }; let h = fn() { let = 1 }; '
+    env = object.Environment()
+    p = parser.Parser(lexer.Lexer(input), lazy_functions=True)
+    evaluator.eval(p.parse_program(), env)
+
+    _test_integer_object(evaluator.eval(parser.Parser(lexer.Lexer('f(3)')).parse_program(), env), 7)
+
+    # creating a closure does not parse its lazy body
+    p = parser.Parser(lexer.Lexer('let k = fn() { let g = fn() { let = 1 }; g }; k()()'), lazy_functions=True)
+    evaluated = evaluator.eval(p.parse_program(), object.Environment())
+    assert issubclass(evaluated.__class__, object.Error), \
+        'no error object returned. got={} ({})'.format(evaluated.__class__.__name__, evaluated)
+
+    # the error is reported on every call, not just the one which parsed the body
+    for _ in range(2):
+        evaluated = evaluator.eval(parser.Parser(lexer.Lexer('h()')).parse_program(), env)
+        assert issubclass(evaluated.__class__, object.Error), \
+            'no error object returned. got={} ({})'.format(evaluated.__class__.__name__, evaluated)
+        assert evaluated.message == 'parse error in function body: expected next token to be IDENT, got = instead'
+
+
 def _test_eval(input: str) -> object.Object:
     l = lexer.Lexer(input)
     p = parser.Parser(l)
@@ -0,0 +1,93 @@
+import io
+import threading
+
+import pytest
+
+import monkey
+from monkey import evaluator, interpreter, object
+
+
+def test_interpreter_runs_compiled_programs():
+    i = monkey.Interpreter()
+    program = i.compile('let scale = fn(x) { x * factor }; scale(n)')
+    assert i.compile('let scale = fn(x) { x * factor }; scale(n)') is program
+
+    assert i.run(program, {'n': 2, 'factor': 21}) == 42
+    assert i.run(program, {'n': 3, 'factor': 3}) == 9
+    assert i.run('n', {'n': 'a'}) == 'a'
+
+    with pytest.raises(interpreter.MonkeyError, match='identifier not found: factor'):
+        i.run(program, {'n': 1})
+
+    with pytest.raises(interpreter.CompileError) as e:
+        i.compile('let = 1;')
+    assert e.value.errors[0] == 'expected next token to be IDENT, got = instead'
+
+
+def test_interpreter_converts_values():
+    i = monkey.Interpreter()
+
+    value = {'name': 'monkey', 'tags': ['a', 'b'], 1: True, False: None}
+    assert i.run('value', {'value': value}) == value
+    assert i.run('[x["tags"][1], x[1], x[false]]', {'x': value}) == ['b', True, None]
+    assert i.run('len(xs)', {'xs': (1, 2, 3)}) == 3
+
+    # host functions are callable from Monkey, Monkey functions from Python
+    assert i.run('add(1, 2) + 3', {'add': lambda a, b: a + b}) == 6
+    with pytest.raises(interpreter.MonkeyError, match='ZeroDivisionError'):
+        i.run('fail()', {'fail': lambda: 1 // 0})
+
+    double = i.run('fn(x) { x * 2 }')
+    assert double(21) == 42
+    assert i.run('map(double)', {'map': lambda f: [f(n) for n in range(3)], 'double': double}) == [0, 2, 4]
+    assert i.run('apply(fn(x) { [x, x] })', {'apply': lambda f: f('a')}) == ['a', 'a']
+
+    with pytest.raises(TypeError):
+        interpreter.to_monkey(1.5)
+    with pytest.raises(TypeError, match='unusable as hash key: ARRAY'):
+        interpreter.to_monkey({(1, 2): 3})
+    assert interpreter.to_monkey(object.Integer(1)).value == 1
+
+
+def test_interpreter_prelude():
+    i = monkey.Interpreter(prelude='let greet = fn(name) { greeting + ", " + name }; let greeting = "Hello";')
+
+    assert i.run('greet(name)', {'name': 'monkey'}) == 'Hello, monkey'
+    assert i.run('let greeting = "Bye"; [greeting, greet("you")]') == ['Bye', 'Hello, you']
+    assert i.run('greeting') == 'Hello'
+    assert i.prelude.frozen
+
+    # closures created by prelude functions keep their own call environments
+    i = monkey.Interpreter(prelude='let adder = fn(x) { fn(y) { x + y } };')
+    assert i.run('let a = adder(1); let b = adder(2); [a(10), b(10)]') == [11, 12]
+
+    with pytest.raises(interpreter.MonkeyError, match='identifier not found: nope'):
+        monkey.Interpreter(prelude='nope')
+
+
+def test_interpreter_output():
+    out = io.StringIO()
+    i = monkey.Interpreter(prelude='puts("prelude")', output=out)
+
+    assert i.run('puts(1, [2]); 3') == 3
+    assert out.getvalue() == 'prelude\n1\n[2]\n'
+
+
+def test_interpreters_in_threads():
+    program = 'let loop = fn(n) { if (n > 0) { puts(tag); loop(n - 1) } }; loop(50); tag'
+    outputs = [io.StringIO() for _ in range(4)]
+    results = {}
+
+    def run(n):
+        i = monkey.Interpreter(output=outputs[n], budget=evaluator.Budget(max_steps=100000))
+        results[n] = [i.run(program, {'tag': n}) for _ in range(5)]
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for n in range(4):
+        assert results[n] == [n] * 5
+        assert outputs[n].getvalue() == '{}\n'.format(n) * 250
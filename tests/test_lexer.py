@@ -129,3 +129,24 @@ def test_next_token():
         tok = l.next_token()
         assert tok.type == tt.expected_type
         assert tok.literal == tt.expected_literal
+
+
+def test_token_offsets():
+    input = 'let x = "ab";\nfn'
+    tests = [
+        (token.LET, 0, 3),
+        (token.IDENT, 4, 5),
+        (token.ASSIGN, 6, 7),
+        (token.STRING, 8, 12),
+        (token.SEMICOLON, 12, 13),
+        (token.FUNCTION, 14, 16),
+        (token.EOF, 16, 16),
+    ]
+
+    tokens = lexer.tokenize(input)
+
+    assert len(tokens) == len(tests), 'wrong number of tokens. got={}'.format(len(tokens))
+    for tok, (expected_type, start, end) in zip(tokens, tests):
+        assert tok.type == expected_type
+        assert (tok.start, tok.end) == (start, end), \
+            'wrong offsets for {}. got=({}, {})'.format(tok, tok.start, tok.end)
@@ -0,0 +1,70 @@
+import json
+
+from monkey import main
+
+
+def test_run(tmp_path, capsys):
+    script = tmp_path / 'script.monkey'
+    script.write_text('let add = fn(a, b) {\n  a + b\n};\nputs(add(1, 2));\n')
+
+    assert main.main(['run', str(script)]) == main.EXIT_OK
+    assert capsys.readouterr().out == '3\n'
+    assert (tmp_path / 'script.monkey.monkeyc').exists()
+
+    # the second run goes through the cache
+    assert main.main(['run', str(script), '--timings']) == main.EXIT_OK
+    captured = capsys.readouterr()
+    assert captured.out == '3\n'
+    assert [line.split()[0] for line in captured.err.splitlines()] == ['read', 'cache', 'eval']
+
+    assert main.main(['run', '--no-cache', '--timings', str(script)]) == main.EXIT_OK
+    captured = capsys.readouterr()
+    assert [line.split()[0] for line in captured.err.splitlines()] == ['read', 'lex', 'parse', 'eval']
+
+
+def test_run_errors(tmp_path, capsys):
+    script = tmp_path / 'script.monkey'
+
+    script.write_text('let x = 1;\nx + true;\n')
+    assert main.main(['run', str(script)]) == main.EXIT_ERROR
+    assert capsys.readouterr().err == 'ERROR: type mismatch: INTEGER + BOOLEAN\n'
+
+    script.write_text('let = 1;\n')
+    assert main.main(['run', str(script)]) == main.EXIT_PARSE_ERROR
+    assert capsys.readouterr().err.startswith(str(script) + ': expected next token to be IDENT')
+
+    assert main.main(['run', str(tmp_path / 'missing.monkey')]) == main.EXIT_PARSE_ERROR
+    assert 'cannot read' in capsys.readouterr().err
+
+
+def test_run_profile(tmp_path, capsys):
+    script = tmp_path / 'script.monkey'
+    script.write_text('let f = fn(n) { n * 2 };\nf(3);\n')
+    profile = tmp_path / 'profile.txt'
+
+    assert main.main(['run', str(script), '--profile', str(profile)]) == main.EXIT_OK
+    assert 'f (1:9)' in profile.read_text()
+    assert 'f (1:9)' in capsys.readouterr().err
+
+
+def test_batch(tmp_path, capsys):
+    paths = []
+    for i, source in enumerate(['puts(1); 1 + 1', 'let f = fn(x) { x * 3 }; f(3)', 'true + 1', 'let = 1;']):
+        script = tmp_path / 'script{}.monkey'.format(i)
+        script.write_text(source)
+        paths.append(str(script))
+
+    listing = tmp_path / 'scripts.txt'
+    listing.write_text('\n'.join(paths[2:]) + '\n')
+
+    assert main.main(['batch', '-j', '2', '--json', '--list', str(listing)] + paths[:2]) == main.EXIT_ERROR
+    results = {}
+    for line in capsys.readouterr().out.splitlines():
+        result = json.loads(line)
+        results[result['script']] = result
+
+    assert results[paths[0]]['result'] == '2'
+    assert results[paths[0]]['output'] == '1\n'
+    assert results[paths[1]]['result'] == '9'
+    assert results[paths[2]]['error'] == 'type mismatch: BOOLEAN + INTEGER'
+    assert results[paths[3]]['error'].startswith('expected next token to be IDENT')
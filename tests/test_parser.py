@@ -717,6 +717,257 @@ def test_parsing_hash_literals_integer_keys():
         test_func(value)
 
 
+def test_incremental_edit_reuses_statements():
+    input = '''let a = 1;
+let b = fn(x) { x * 2 };
+let c = a + 3;
+let d = b(c);
+'''
+    ip = parser.IncrementalParser(input)
+    assert ip.errors == []
+    before = ip.program.statements
+
+    # let c = a + 3;  ->  let c = a + 30;
+    offset = input.index('3;') + 1
+    program = ip.edit(offset, 0, '0')
+
+    assert ip.errors == []
+    assert len(program.statements) == 4
+    assert program.statements[0] is before[0]
+    assert program.statements[1] is before[1]
+    assert program.statements[2] is not before[2]
+    assert program.statements[3] is before[3]
+    assert program.statements[2].string() == 'let c = (a + 30);'
+
+    d = program.statements[3].token
+    assert ip.input[d.start:d.end] == 'let', 'tokens after the edit were not shifted'
+
+
+def test_incremental_edit_matches_full_parse():
+    input = '''let five = 5;
+let add = fn(x, y) { x + y; };
+add(five, 10) * 2
+if (five > 1) { "yes" } else { "no" }
+'''
+    edits = [
+        (input.index(';'), 1, ''),            # merges the first two statements
+        (0, 0, 'let '),                       # broken statement at the start
+        (4, 0, 'z = '),
+        (input.index('"yes"'), 0, '"'),       # unterminated string swallows the rest
+        (input.index('"yes"'), 1, ''),
+    ]
+
+    ip = parser.IncrementalParser(input)
+    source = input
+    for offset, deleted, inserted in edits:
+        program = ip.edit(offset, deleted, inserted)
+        source = source[:offset] + inserted + source[offset + deleted:]
+
+        p = parser.Parser(lexer.Lexer(source))
+        expected = p.parse_program()
+
+        assert ip.errors == p.errors
+        assert [s.__class__ for s in program.statements] == [s.__class__ for s in expected.statements]
+        assert [t.literal for t in ip.tokens] == [t.literal for t in lexer.tokenize(source)]
+
+
+def test_parallel_parser_matches_serial_parse():
+    input = '''let add = fn(a, b) { a + b; };
+let pair = {"x;": [1, 2], "y": add(1, 2)}
+add(1, 2) * 3
+let s = "let return"
+return pair["x;"]
+let bad = ;
+let b = if (s) { 1 } else { 2 };
+'''
+
+    p = parser.Parser(lexer.Lexer(input))
+    expected = p.parse_program()
+
+    pp = parser.ParallelParser(input, max_workers=2, chunk_size=1)
+    assert len(pp.chunks()) == 6
+    program = pp.parse_program()
+
+    assert [s.__class__ for s in program.statements] == [s.__class__ for s in expected.statements]
+    assert [s.token.start for s in program.statements] == [s.token.start for s in expected.statements]
+    assert program.statements[2].string() == expected.statements[2].string()
+    assert pp.errors == p.errors == ['no prefix parse function for ; found']
+    assert pp.error_offsets == p.error_offsets == [input.index('= ;') + 2]
+
+
+def test_parallel_parser_matches_serial_parse_on_invalid_input():
+    inputs = [
+        'x;; y',
+        'return let x = 1; x',
+        'let x;; let y = 2;',
+        'return; ; let z = [1;',
+        'if (x) { 1 } else let a = 1; a',
+    ]
+
+    for input in inputs:
+        p = parser.Parser(lexer.Lexer(input))
+        expected = p.parse_program()
+
+        pp = parser.ParallelParser(input, max_workers=1, chunk_size=1)
+        program = pp.parse_program()
+
+        assert [s.token.start for s in program.statements] == [s.token.start for s in expected.statements], input
+        assert pp.errors == p.errors, input
+        assert pp.error_offsets == p.error_offsets, input
+
+
+def test_parse_file_uses_cache(tmp_path):
+    script = tmp_path / 'script.monkey'
+    script.write_text('let x = 5 * 2; x')
+
+    program, errors = parser.parse_file(str(script))
+    assert errors == []
+    assert (tmp_path / 'script.monkey.monkeyc').exists()
+
+    cached, errors = parser.parse_file(str(script))
+    assert errors == []
+    assert cached is not program
+    assert cached.string() == program.string() == 'let x = (5 * 2);x'
+
+    # a changed source invalidates the cache
+    script.write_text('let x = 5 * 3; x')
+    program, errors = parser.parse_file(str(script))
+    assert program.string() == 'let x = (5 * 3);x'
+
+    # programs with errors are not cached
+    script.write_text('let = 5;')
+    program, errors = parser.parse_file(str(script))
+    assert len(errors) > 0
+    assert parser.read_cache(str(script), 'let = 5;') is None
+
+    # scripts differing only in their extension do not share a cache
+    other = tmp_path / 'script.txt'
+    other.write_text('let x = 5 * 3; x')
+    parser.parse_file(str(other))
+    script.write_text('let x = 5 * 3; x')
+    parser.parse_file(str(script))
+    assert parser.cache_path(str(other)) != parser.cache_path(str(script))
+    assert (tmp_path / 'script.txt.monkeyc').exists()
+    assert (tmp_path / 'script.monkey.monkeyc').exists()
+
+
+def test_iterative_parser_matches_recursive_parser():
+    inputs = [
+        'let x = -a * b + c(d, e[1 + 2]) / (3 - 4) == !true;',
+        'if (x < y) { return x; } else { let z = fn(a, b) { a + b }; z(x, y) }',
+        'let h = {"a": [1, 2], b: {"c": fn() { 1 }}}; h["a"][0]',
+    ]
+    invalid = 'let = 5; if (x { y } else }; fn(a, 1) { }; [1, 2'
+
+    for input in inputs:
+        p = parser.Parser(lexer.Lexer(input))
+        expected = p.parse_program()
+        ip = parser.IterativeParser(lexer.Lexer(input))
+        program = ip.parse_program()
+
+        assert ip.errors == p.errors == []
+        assert [s.string() for s in program.statements] == [s.string() for s in expected.statements]
+
+    p = parser.Parser(lexer.Lexer(invalid))
+    expected = p.parse_program()
+    ip = parser.IterativeParser(lexer.Lexer(invalid))
+    program = ip.parse_program()
+
+    assert len(p.errors) > 0
+    assert ip.errors == p.errors
+    assert [s.__class__ for s in program.statements] == [s.__class__ for s in expected.statements]
+
+
+def test_iterative_parser_handles_deep_nesting():
+    depth = 5000
+    inputs = [
+        '(' * depth + '1' + ')' * depth,
+        '[' * depth + ']' * depth,
+        'if (true) { ' * depth + '1' + ' }' * depth,
+        '-' * depth + '1',
+        'f' + '(1)' * depth,
+    ]
+
+    for input in inputs:
+        p = parser.IterativeParser(lexer.Lexer(input))
+        program = p.parse_program()
+        check_parser_errors(p)
+        assert len(program.statements) == 1
+
+    array = program.statements[0].expression
+    for _ in range(depth - 1):
+        array = array.function
+    assert array.function.value == 'f'
+
+    grouped = parser.IterativeParser(lexer.Lexer('(' * depth + '1' + ')' * depth)).parse_program()
+    assert grouped.statements[0].expression.value == 1
+
+
+def test_error_recovery():
+    input = '''let a = 1;
+let b = ;
+let f = fn(x) {
+  let y = x + ;
+  if (y { y }
+  return y * 2;
+};
+let c = f(a;
+let d = [1, 2 3];
+}
+let g = 7;
+'''
+    p = parser.Parser(lexer.Lexer(input), recover=True)
+    program = p.parse_program()
+
+    assert p.errors == [
+        'no prefix parse function for ; found',
+        'no prefix parse function for ; found',
+        'expected next token to be ), got { instead',
+        'expected next token to be ), got ; instead',
+        'expected next token to be ], got INT instead',
+        'no prefix parse function for } found',
+    ]
+    assert p.error_offsets[2] == input.index('{ y }')
+
+    classes = [s.__class__.__name__ for s in program.statements]
+    assert classes == ['LetStatement', 'ErrorStatement', 'LetStatement', 'ErrorStatement',
+                       'ErrorStatement', 'ErrorStatement', 'LetStatement']
+
+    body = program.statements[2].value.body.statements
+    assert [s.__class__.__name__ for s in body] == ['ErrorStatement', 'ErrorStatement', 'ReturnStatement']
+    assert body[0].message == 'no prefix parse function for ; found'
+    assert body[0].token.literal == 'let'
+    assert program.statements[-1].string() == 'let g = 7;'
+
+    p = parser.Parser(lexer.Lexer(input), recover=True, max_errors=2)
+    program = p.parse_program()
+    assert len(p.errors) == 2
+    assert len(program.statements) == 3
+
+
+def test_lazy_function_bodies():
+    input = 'let f = fn(x) { let g = fn(y) { y * 2 }; g(x) + 1 }; let h = fn() { let = 1 }; f(3)'
+    p = parser.Parser(lexer.Lexer(input), lazy_functions=True)
+    program = p.parse_program()
+    check_parser_errors(p)
+
+    body = program.statements[0].value.body
+    assert isinstance(body, ast.LazyBlockStatement)
+    assert not body.parsed
+
+    assert body.parse() == []
+    assert body.parsed
+    assert isinstance(body.statements[0].value.body, ast.LazyBlockStatement)
+    assert not body.statements[0].value.body.parsed
+
+    assert program.statements[1].value.body.parse()[0] == 'expected next token to be IDENT, got = instead'
+
+    for cls in (parser.Parser, parser.IterativeParser):
+        eager = parser.Parser(lexer.Lexer(input)).parse_program()
+        lazy = cls(lexer.Lexer(input), lazy_functions=True).parse_program()
+        assert lazy.string() == eager.string()
+
+
 def _test_let_statement(s: ast.Statement, name: str):
     assert s.token_literal() == 'let', "s.token_literal not 'let'. got='{}'".format(s.token_literal())
     assert issubclass(s.__class__, ast.LetStatement), 's not ast.LetStatement. got={}'.format(s.__class__.__name__)
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from monkey import server
+
+SLOW = 'let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(30)'
+
+
+async def _request(port: int, method: str, path: str, body: dict = None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    data = json.dumps(body).encode() if body is not None else b''
+    writer.write('{} {} HTTP/1.1\r\nContent-Length: {}\r\n\r\n'.format(method, path, len(data)).encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_server(tmp_path):
+    (tmp_path / 'double.monkey').write_text('let double = fn(x) { x * 2 }; double(21)')
+
+    async def run():
+        s = server.Server(port=0, max_workers=1, timeout=0.5, max_concurrency=1, max_queued=0,
+                          scripts_dir=str(tmp_path))
+        await s.start()
+        try:
+            status, body = await _request(s.port, 'POST', '/eval', {'source': 'puts("hi"); [1, 2]'})
+            assert status == 200
+            assert (body['ok'], body['result'], body['output']) == (True, '[1, 2]', 'hi\n')
+
+            status, body = await _request(s.port, 'POST', '/eval', {'script': 'double.monkey'})
+            assert (status, body['result']) == (200, '42')
+
+            status, body = await _request(s.port, 'POST', '/eval', {'source': '1 +'})
+            assert (status, body['ok']) == (200, False)
+            assert body['error'] == 'no prefix parse function for EOF found'
+
+            assert (await _request(s.port, 'POST', '/eval', {'script': '../double.monkey'}))[0] == 404
+            assert (await _request(s.port, 'POST', '/eval', {'code': 1}))[0] == 400
+            assert (await _request(s.port, 'GET', '/eval'))[0] == 405
+            assert (await _request(s.port, 'GET', '/nowhere'))[0] == 404
+
+            # one slow script takes the only slot, so the other request is refused
+            slow, refused = await asyncio.gather(
+                _request(s.port, 'POST', '/eval', {'source': SLOW}),
+                _request(s.port, 'POST', '/eval', {'source': SLOW}))
+            assert sorted([slow[0], refused[0]]) == [200, 503]
+            assert {slow[1].get('error'), refused[1].get('error')} == {'time limit of 0.5s exceeded',
+                                                                      'too many requests'}
+
+            status, body = await _request(s.port, 'GET', '/health')
+            assert (status, body['served']) == (200, 4)
+        finally:
+            await s.close()
+
+    asyncio.run(run())